@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+
+# Add the repository root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+from src.crypto.backends import BACKENDS, get_backend
+
+def rate(operation, items):
+    """Operations per second of operation applied to every item"""
+    start = time.perf_counter()
+    for item in items:
+        operation(item)
+    return len(items) / (time.perf_counter() - start)
+
+def run(backend, count):
+    payload = b'{"doctor_id": "DOC001", "patient_id": "PAT000001", "ipfs_hash": "Qm"}'
+    results = {}
+
+    results["keygen"] = rate(lambda _: backend.generate_key_pair(), range(count))
+    pairs = [backend.generate_key_pair() for _ in range(count)]
+    results["sign"] = rate(lambda pair: backend.sign(pair[0], payload), pairs)
+
+    jobs = [(pair[1], backend.sign(pair[0], payload)) for pair in pairs]
+    results["verify"] = rate(lambda job: backend.verify(job[0], job[1], payload), jobs)
+
+    # Keys as stored on patients and doctors: hex that has to be parsed first
+    encoded = [(backend.public_key_to_bytes(key).hex(), signature) for key, signature in jobs]
+    results["parse+verify"] = rate(
+        lambda job: backend.verify(backend.load_public_key(bytes.fromhex(job[0])), job[1], payload),
+        encoded
+    )
+    return results, pairs
+
+def check_compatibility(backends, pairs):
+    """Every backend must verify signatures and load keys made by every other"""
+    payload = b"compatibility"
+    for signer in backends.values():
+        private_key, public_key = pairs[signer.name][0]
+        signature = signer.sign(private_key, payload)
+        priv_raw = signer.private_key_to_bytes(private_key)
+        pub_raw = signer.public_key_to_bytes(public_key)
+        for verifier in backends.values():
+            loaded = verifier.load_public_key(pub_raw)
+            assert verifier.verify(loaded, signature, payload), (signer.name, verifier.name)
+            assert verifier.private_key_to_bytes(verifier.load_private_key(priv_raw)) == priv_raw
+            assert verifier.public_key_to_bytes(loaded) == pub_raw
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    backends = {}
+    for name in BACKENDS:
+        try:
+            backends[name] = get_backend(name)
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+
+    print(f"{count:,} operations per measurement")
+    print(f"{'backend':>12} | {'keygen/s':>9} | {'sign/s':>9} | {'verify/s':>9} | {'parse+verify/s':>14}")
+    pairs = {}
+    for name, backend in backends.items():
+        results, pairs[name] = run(backend, count)
+        print(f"{name:>12} | {results['keygen']:>9,.0f} | {results['sign']:>9,.0f} | "
+              f"{results['verify']:>9,.0f} | {results['parse+verify']:>14,.0f}")
+
+    check_compatibility(backends, pairs)
+    print("Keys and signatures are interchangeable between backends")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Add the repository root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+from src.blockchain.blockchain_core import Block
+from src.blockchain import merkle
+
+class DictBlock:
+    """The previous Block layout: a plain object holding hex strings and transaction dicts"""
+
+    def __init__(self, index, timestamp, data, previous_hash, nonce, block_hash):
+        self.index = index
+        self.timestamp = timestamp
+        self.data = data
+        self.previous_hash = previous_hash
+        self.nonce = nonce
+        self.hash = block_hash
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["index"], data["timestamp"], data["data"], data["previous_hash"], data["nonce"], data["hash"])
+
+def stored_blocks(transaction_count, per_block):
+    """Yield block JSON shaped like the block log, one string per block, with its Merkle root"""
+    start = datetime(2024, 1, 1)
+    for index in range((transaction_count + per_block - 1) // per_block):
+        transactions = []
+        for offset in range(min(per_block, transaction_count - index * per_block)):
+            n = index * per_block + offset
+            transactions.append({
+                "type": "EMR_CREATION",
+                "patient_id": f"PAT{n % 100000:06d}",
+                "doctor_id": f"DOC{n % 500:03d}",
+                "ipfs_hash": f"{n:064x}",
+                "encrypted_session_key": f"{n:032x}",
+                "signature": f"{n:0128x}",
+                "timestamp": (start + timedelta(microseconds=n * 7919)).isoformat()
+            })
+        yield json.dumps({
+            "index": index + 1,
+            "timestamp": (start + timedelta(seconds=index)).isoformat(),
+            "data": transactions,
+            "previous_hash": f"{index:064x}",
+            "nonce": index,
+            "hash": f"{index + 1:064x}",
+            "merkle_root": merkle.merkle_root([merkle.leaf_hash(tx) for tx in transactions]).hex()
+        })
+
+def validate(chain):
+    """The per-block work of Blockchain.is_chain_valid: header hash and Merkle root"""
+    for block in chain:
+        block.calculate_hash()
+        block.has_valid_merkle_root()
+
+def measure(block_class, transaction_count, per_block, validated=False):
+    """Bytes retained by a chain of block_class loaded from JSON and, if validated, again after a validation pass"""
+    gc.collect()
+    tracemalloc.start()
+    chain = [block_class.from_dict(json.loads(text)) for text in stored_blocks(transaction_count, per_block)]
+    gc.collect()
+    retained = [tracemalloc.get_traced_memory()[0]]
+    if validated:
+        # Steady state, measured on the same chain so only what validation leaves on the blocks differs
+        validate(chain)
+        gc.collect()
+        retained.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+    return retained, len(chain)
+
+def main():
+    transaction_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    per_block = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    print(f"{transaction_count:,} transactions, {per_block} per block")
+    print(f"{'layout':>10} | {'total MiB':>10} | {'bytes/block':>11} | {'bytes/tx':>9}")
+    (dict_loaded,), blocks = measure(DictBlock, transaction_count, per_block)
+    (loaded, validated), blocks = measure(Block, transaction_count, per_block, validated=True)
+    for name, retained in (("dict", dict_loaded), ("compact", loaded), ("validated", validated)):
+        print(f"{name:>10} | {retained / 2**20:>10,.1f} | {retained / blocks:>11,.0f} | {retained / transaction_count:>9,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add the repository root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+from src.blockchain.blockchain_core import Block
+from src.blockchain.mining import MiningEngine
+
+def sample_transactions(count):
+    """Build EMR transactions shaped like Blockchain.add_emr_transaction output"""
+    return [{
+        "type": "EMR_CREATION",
+        "patient_id": f"PAT{i:06d}",
+        "doctor_id": f"DOC{i % 50:03d}",
+        "ipfs_hash": f"{i:064x}",
+        "encrypted_session_key": f"{i:032x}",
+        "signature": f"{i:0128x}",
+        "timestamp": datetime.now().isoformat()
+    } for i in range(count)]
+
+def legacy_rate(block, attempts):
+    """Hashes per second of the calculate_hash()-per-nonce loop"""
+    start = time.perf_counter()
+    for nonce in range(attempts):
+        block.nonce = nonce
+        block.calculate_hash()
+    return attempts / (time.perf_counter() - start)
+
+def engine_rate(block, attempts):
+    """Hashes per second of MiningEngine, including midstate setup"""
+    start = time.perf_counter()
+    # A 64-zero target is never met, so the engine tries every nonce in the range
+    MiningEngine.for_header(block.header_fields(), 64).search(0, attempts)
+    return attempts / (time.perf_counter() - start)
+
+def main():
+    attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'transactions':>12} | {'legacy H/s':>12} | {'engine H/s':>12} | speedup")
+    for tx_count in (1, 10, 100):
+        block = Block(1, datetime.now().isoformat(), sample_transactions(tx_count), "0" * 64)
+
+        # Both paths must agree on every hash
+        engine = MiningEngine.for_header(block.header_fields(), 0)
+        block.nonce = 12345
+        assert engine.hash_nonce(12345) == block.calculate_hash()
+
+        legacy = legacy_rate(block, attempts)
+        fast = engine_rate(block, attempts)
+        print(f"{tx_count:>12} | {legacy:>12,.0f} | {fast:>12,.0f} | {fast / legacy:.1f}x")
+
+if __name__ == "__main__":
+    main()
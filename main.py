@@ -48,6 +48,9 @@ def main():
         # Start the GUI
         root.mainloop()
         
+        # Commit any EMRs still waiting in the mempool
+        healthcare_system.shutdown()
+        
     except Exception as e:
         print(f"Error starting application: {e}")
         import traceback
@@ -1,38 +1,180 @@
-import json
 import hashlib
 import time
+import threading
 from datetime import datetime
+from src.utils import canonical
 from src.utils.config import Config
+from src.blockchain.mining import MiningEngine, ParallelMiner
+from src.blockchain.compact import Transaction, pack_hex, unpack_hex, pack_timestamp, unpack_timestamp
+from src.blockchain import merkle
 
 class Block:
-    def __init__(self, index, timestamp, data, previous_hash):
+    # Hashes are held as 32 raw bytes, timestamps as integer microseconds and EMR
+    # transactions as slotted Transaction objects; hex and dict views are built on access
+    __slots__ = (
+        'index', '_nonce', '_timestamp', '_data', '_previous_hash', '_hash', '_merkle_root', '_owner'
+    )
+    
+    def __init__(self, index, timestamp, data, previous_hash, nonce=0, block_hash=None, merkle_root=None):
+        # Blockchain holding this block; setters report mutations to it
+        self._owner = None
         self.index = index
         self.timestamp = timestamp
         self.data = data
         self.previous_hash = previous_hash
-        self.nonce = 0
-        self.hash = self.calculate_hash()
+        self.nonce = nonce
+        # Blocks with a Merkle root hash the root in place of their data
+        self.merkle_root = merkle_root
+        # Stored blocks pass their hash in; recomputing it is validation's job
+        self.hash = block_hash if block_hash is not None else self.calculate_hash()
     
-    def calculate_hash(self):
-        """Calculate SHA-256 hash of the block"""
-        block_string = json.dumps({
+    def attach(self, blockchain):
+        """Report later mutations of this block to the chain holding it"""
+        self._owner = blockchain
+    
+    def _changed(self):
+        # Blocks from this one up are no longer known valid
+        if self._owner is not None:
+            self._owner.invalidate_verification(self.index)
+    
+    @property
+    def nonce(self):
+        return self._nonce
+    
+    @nonce.setter
+    def nonce(self, value):
+        self._nonce = value
+        self._changed()
+    
+    @property
+    def timestamp(self):
+        return unpack_timestamp(self._timestamp)
+    
+    @timestamp.setter
+    def timestamp(self, value):
+        self._timestamp = pack_timestamp(value)
+        self._changed()
+    
+    @property
+    def previous_hash(self):
+        return unpack_hex(self._previous_hash)
+    
+    @previous_hash.setter
+    def previous_hash(self, value):
+        self._previous_hash = pack_hex(value)
+        self._changed()
+    
+    @property
+    def hash(self):
+        return unpack_hex(self._hash)
+    
+    @hash.setter
+    def hash(self, value):
+        self._hash = pack_hex(value)
+        self._changed()
+    
+    @property
+    def merkle_root(self):
+        return unpack_hex(self._merkle_root)
+    
+    @merkle_root.setter
+    def merkle_root(self, value):
+        self._merkle_root = pack_hex(value)
+        self._changed()
+    
+    def _has_transactions(self):
+        return isinstance(self._data, tuple) and bool(self._data) and isinstance(self._data[0], Transaction)
+    
+    @property
+    def data(self):
+        """Block data; EMR transactions come back as a fresh list of dicts"""
+        if self._has_transactions():
+            return [transaction.to_dict() for transaction in self._data]
+        return self._data
+    
+    @data.setter
+    def data(self, value):
+        if isinstance(value, list) and value and all(Transaction.can_compact(item) for item in value):
+            self._data = tuple(Transaction.from_dict(item) for item in value)
+        else:
+            self._data = value
+        self._changed()
+    
+    def get_transaction(self, offset):
+        """Get one transaction without building the whole data list"""
+        if self._has_transactions():
+            return self._data[offset].to_dict()
+        return self._data[offset]
+    
+    def transaction_count(self):
+        """Number of transactions, counting non-list data as a single entry"""
+        if self._has_transactions() or isinstance(self._data, list):
+            return len(self._data)
+        return 1
+    
+    def leaf_hashes(self):
+        """Merkle leaf hashes of the block's transactions"""
+        if self._has_transactions():
+            return [transaction.leaf_hash() for transaction in self._data]
+        return [merkle.leaf_hash(transaction) for transaction in self.data]
+    
+    def calculate_merkle_root(self):
+        """Merkle root over the block's transaction list"""
+        return merkle.merkle_root(self.leaf_hashes()).hex()
+    
+    def has_valid_merkle_root(self):
+        """Whether the stored Merkle root, if any, matches the block's transactions"""
+        if self._merkle_root is None:
+            return True
+        # Checked on the stored form: self.data would build a dict per transaction
+        if not (self._has_transactions() or isinstance(self._data, list)):
+            return False
+        return self.merkle_root == self.calculate_merkle_root()
+    
+    def header_fields(self):
+        """Fields covered by the block hash, excluding the nonce"""
+        if self._merkle_root is not None:
+            return {
+                "index": self.index,
+                "timestamp": self.timestamp,
+                "merkle_root": self.merkle_root,
+                "previous_hash": self.previous_hash
+            }
+        return {
             "index": self.index,
             "timestamp": self.timestamp,
             "data": self.data,
-            "previous_hash": self.previous_hash,
-            "nonce": self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
+            "previous_hash": self.previous_hash
+        }
+    
+    def header(self):
+        """Hashed header fields plus the hash itself, enough to check an inclusion proof"""
+        header = self.header_fields()
+        header["nonce"] = self.nonce
+        header["hash"] = self.hash
+        return header
+    
+    def header_serialization(self):
+        """Canonical header bytes before and after the nonce.
+        
+        Built on each call and not kept on the block: MiningEngine holds them
+        for the length of a search, and a resident chain stays compact.
+        """
+        return canonical.split_around(self.header_fields(), "nonce")
+    
+    def calculate_hash(self):
+        """Calculate SHA-256 hash of the block"""
+        prefix, suffix = self.header_serialization()
+        return hashlib.sha256(prefix + b"%d" % self.nonce + suffix).hexdigest()
     
     def mine_block(self, difficulty):
         """Mine block with given difficulty"""
-        target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+        # Serialize the header once and only hash the nonce bytes per attempt
+        engine = MiningEngine.for_block(self, difficulty)
+        self.nonce, self.hash = engine.search(self.nonce)
     
     def to_dict(self):
-        return {
+        block_dict = {
             "index": self.index,
             "timestamp": self.timestamp,
             "data": self.data,
@@ -40,12 +182,43 @@ class Block:
             "nonce": self.nonce,
             "hash": self.hash
         }
+        if self._merkle_root is not None:
+            block_dict["merkle_root"] = self.merkle_root
+        return block_dict
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Create Block from dictionary"""
+        return cls(
+            data["index"],
+            data["timestamp"],
+            data["data"],
+            data["previous_hash"],
+            data["nonce"],
+            data["hash"],
+            data.get("merkle_root")
+        )
 
 class Blockchain:
     def __init__(self):
         self.chain = [self.create_genesis_block()]
+        self.chain[0].attach(self)
         self.difficulty = Config.DIFFICULTY
         self.pending_transactions = []
+        self.miner = ParallelMiner(Config.MINING_WORKERS, Config.PARALLEL_MINING_MIN_DIFFICULTY)
+        # Serializes appends from the GUI thread and the mempool block builder
+        self.lock = threading.RLock()
+        # EMR lookup indexes: patient/doctor id -> [(block index, tx offset)], ipfs hash -> (block index, tx offset)
+        self._patient_index = {}
+        self._doctor_index = {}
+        self._ipfs_index = {}
+        # False while the chain is backed by storage and the indexes have not been built yet
+        self._indexed = True
+        # Blocks up to this height are known valid, as long as that block still has this hash
+        self._verified_height = 0
+        self._verified_hash = self.chain[0].hash
+        # Transactions in every block after genesis, kept so stats never walk the chain
+        self._transaction_count = 0
     
     def create_genesis_block(self):
         """Create the first block in the chain"""
@@ -57,36 +230,93 @@ class Blockchain:
     
     def add_block(self, data):
         """Add a new block to the chain"""
-        latest_block = self.get_latest_block()
-        new_block = Block(
-            len(self.chain),
-            datetime.now().isoformat(),
-            data,
-            latest_block.hash
-        )
-        new_block.mine_block(self.difficulty)
-        self.chain.append(new_block)
-        return new_block
+        with self.lock:
+            latest_block = self.get_latest_block()
+            # The hash is set by mining, once the header is final
+            new_block = Block(
+                len(self.chain),
+                datetime.now().isoformat(),
+                data,
+                latest_block.hash,
+                block_hash=""
+            )
+            if isinstance(data, list):
+                new_block.merkle_root = new_block.calculate_merkle_root()
+            self.miner.mine(new_block, self.difficulty)
+            self.chain.append(new_block)
+            new_block.attach(self)
+            self._transaction_count += new_block.transaction_count()
+            self.index_block(len(self.chain) - 1, new_block)
+            return new_block
     
-    def is_chain_valid(self):
-        """Validate the entire blockchain"""
-        for i in range(1, len(self.chain)):
+    def find_invalid_block(self, start=1, stop=None):
+        """Return the index of the first invalid block in [start, stop), or None"""
+        if stop is None:
+            stop = len(self.chain)
+        for i in range(max(start, 1), stop):
             current_block = self.chain[i]
             previous_block = self.chain[i-1]
             
             # Check if current block hash is valid
             if current_block.hash != current_block.calculate_hash():
-                return False
+                return i
+            
+            # Check the transactions still match the hashed Merkle root
+            if not current_block.has_valid_merkle_root():
+                return i
             
             # Check if previous hash matches
             if current_block.previous_hash != previous_block.hash:
-                return False
+                return i
         
-        return True
+        return None
     
-    def add_emr_transaction(self, patient_id, doctor_id, ipfs_hash, encrypted_key, signature):
-        """Add EMR transaction to blockchain"""
-        transaction = {
+    def is_chain_valid(self):
+        """Validate the blockchain, rechecking only blocks above the verified watermark"""
+        with self.lock:
+            height = self._verified_height
+            if height >= len(self.chain) or self.chain[height].hash != self._verified_hash:
+                # The verified prefix changed since it was checked
+                self.invalidate_verification()
+                height = 0
+            
+            if self.find_invalid_block(height + 1) is not None:
+                return False
+            
+            self._verified_height = len(self.chain) - 1
+            self._verified_hash = self.chain[-1].hash
+            return True
+    
+    def transaction_count(self):
+        """Number of transactions in all blocks after genesis"""
+        return self._transaction_count
+    
+    def revalidate_chain(self):
+        """Validate the entire blockchain from genesis, ignoring the watermark (for audits)"""
+        with self.lock:
+            self.invalidate_verification()
+            return self.is_chain_valid()
+    
+    def mark_verified(self, height):
+        """Record that blocks up to height were verified by an external audit"""
+        with self.lock:
+            if height > self._verified_height:
+                self._verified_height = height
+                self._verified_hash = self.chain[height].hash
+    
+    def invalidate_verification(self, from_index=0):
+        """Drop the watermark below from_index; block setters call it for the block they change"""
+        with self.lock:
+            if from_index > self._verified_height:
+                return
+            height = min(max(from_index - 1, 0), len(self.chain) - 1)
+            self._verified_height = max(height, 0)
+            self._verified_hash = self.chain[height].hash if self.chain else None
+    
+    @staticmethod
+    def create_emr_transaction(patient_id, doctor_id, ipfs_hash, encrypted_key, signature):
+        """Build an EMR transaction record"""
+        return {
             "type": "EMR_CREATION",
             "patient_id": patient_id,
             "doctor_id": doctor_id,
@@ -95,6 +325,10 @@ class Blockchain:
             "signature": signature,
             "timestamp": datetime.now().isoformat()
         }
+    
+    def add_emr_transaction(self, patient_id, doctor_id, ipfs_hash, encrypted_key, signature):
+        """Add EMR transaction to blockchain"""
+        transaction = self.create_emr_transaction(patient_id, doctor_id, ipfs_hash, encrypted_key, signature)
         
         # Add to pending transactions and create block
         self.pending_transactions.append(transaction)
@@ -102,19 +336,121 @@ class Blockchain:
         self.pending_transactions = []  # Clear pending transactions
         return new_block
     
+    @staticmethod
+    def _index_into(patient_index, doctor_index, ipfs_index, position, block):
+        if position == 0 or not isinstance(block.data, list):  # Genesis block is never indexed
+            return
+        for offset, transaction in enumerate(block.data):
+            if not isinstance(transaction, dict) or transaction.get("type") != "EMR_CREATION":
+                continue
+            location = (position, offset)
+            patient_index.setdefault(transaction.get("patient_id"), []).append(location)
+            doctor_index.setdefault(transaction.get("doctor_id"), []).append(location)
+            ipfs_index[transaction.get("ipfs_hash")] = location
+    
+    def index_block(self, position, block):
+        """Add a block's EMR transactions to the lookup indexes"""
+        if not self._indexed:  # Picked up by the deferred rebuild
+            return
+        self._index_into(self._patient_index, self._doctor_index, self._ipfs_index, position, block)
+    
+    def rebuild_indexes(self):
+        """Rebuild the EMR lookup indexes from the whole chain"""
+        with self.lock:
+            # Built aside and swapped in, so unlocked readers never see a partial index
+            patient_index, doctor_index, ipfs_index = {}, {}, {}
+            for position, block in enumerate(self.chain):
+                self._index_into(patient_index, doctor_index, ipfs_index, position, block)
+            self._patient_index = patient_index
+            self._doctor_index = doctor_index
+            self._ipfs_index = ipfs_index
+            # Set last: ensure_indexes checks it without the lock
+            self._indexed = True
+    
+    def ensure_indexes(self):
+        """Build the lookup indexes on first use for storage-backed chains"""
+        if not self._indexed:
+            with self.lock:
+                if not self._indexed:
+                    self.rebuild_indexes()
+    
+    def get_transaction_at(self, location):
+        """Get the transaction at a (block index, tx offset) location"""
+        block_index, offset = location
+        return self.chain[block_index].get_transaction(offset)
+    
     def get_emr_transactions(self, patient_id=None, doctor_id=None):
         """Get EMR transactions with optional filtering"""
-        all_transactions = []
-        for block in self.chain[1:]:  # Skip genesis block
-            if isinstance(block.data, list):
-                for transaction in block.data:
-                    if transaction.get("type") == "EMR_CREATION":
-                        if patient_id and transaction.get("patient_id") != patient_id:
-                            continue
-                        if doctor_id and transaction.get("doctor_id") != doctor_id:
-                            continue
-                        all_transactions.append(transaction)
-        return all_transactions
+        self.ensure_indexes()
+        if not patient_id and not doctor_id:
+            locations = [location for block_locations in self._patient_index.values() for location in block_locations]
+            locations.sort()
+        elif patient_id and doctor_id:
+            # Walk the shorter index and filter on the other field
+            patient_locations = self._patient_index.get(patient_id, [])
+            doctor_locations = self._doctor_index.get(doctor_id, [])
+            if len(patient_locations) <= len(doctor_locations):
+                locations = [loc for loc in patient_locations
+                             if self.get_transaction_at(loc).get("doctor_id") == doctor_id]
+            else:
+                locations = [loc for loc in doctor_locations
+                             if self.get_transaction_at(loc).get("patient_id") == patient_id]
+        elif patient_id:
+            locations = self._patient_index.get(patient_id, [])
+        else:
+            locations = self._doctor_index.get(doctor_id, [])
+        
+        return [self.get_transaction_at(location) for location in locations]
+    
+    def get_transaction_by_ipfs_hash(self, ipfs_hash):
+        """Get the EMR transaction that references an IPFS hash"""
+        self.ensure_indexes()
+        location = self._ipfs_index.get(ipfs_hash)
+        if location is None:
+            return None
+        return self.get_transaction_at(location)
+    
+    def get_inclusion_proof(self, ipfs_hash=None, transaction=None):
+        """Merkle inclusion proof for an EMR transaction, found by ipfs_hash or by the transaction itself"""
+        self.ensure_indexes()
+        if transaction is not None:
+            ipfs_hash = transaction.get("ipfs_hash")
+        location = self._ipfs_index.get(ipfs_hash)
+        if location is None:
+            return None
+        
+        block_index, offset = location
+        block = self.chain[block_index]
+        if block.merkle_root is None:
+            return None  # Blocks mined before Merkle roots were introduced
+        if transaction is not None and block.get_transaction(offset) != transaction:
+            return None
+        
+        return {
+            "block_index": block_index,
+            "transaction_index": offset,
+            "path": merkle.merkle_path(block.leaf_hashes(), offset),
+            "header": block.header()
+        }
+    
+    @staticmethod
+    def verify_inclusion_proof(transaction, proof, header=None):
+        """Check a transaction's inclusion proof against a block header alone.
+        
+        Pass a header obtained independently to avoid trusting the one in the proof.
+        """
+        header = header or proof["header"]
+        if "merkle_root" not in header:
+            return False
+        
+        # The path must lead from the transaction to the header's Merkle root
+        root = merkle.root_from_path(merkle.leaf_hash(transaction), proof["path"])
+        if root.hex() != header["merkle_root"]:
+            return False
+        
+        # And the header must hash to the block hash it claims
+        fields = {key: value for key, value in header.items() if key != "hash"}
+        return canonical.hexdigest(fields) == header["hash"]
     
     def to_dict(self):
         """Convert blockchain to dictionary for storage"""
@@ -130,15 +466,31 @@ class Blockchain:
         blockchain = cls()
         blockchain.chain = []
         for block_data in data["chain"]:
-            block = Block(
-                block_data["index"],
-                block_data["timestamp"],
-                block_data["data"],
-                block_data["previous_hash"]
-            )
-            block.nonce = block_data["nonce"]
-            block.hash = block_data["hash"]
+            block = Block.from_dict(block_data)
+            block.attach(blockchain)
             blockchain.chain.append(block)
         blockchain.difficulty = data["difficulty"]
         blockchain.pending_transactions = data["pending_transactions"]
+        blockchain._transaction_count = sum(block.transaction_count() for block in blockchain.chain[1:])
+        blockchain.rebuild_indexes()
+        # Nothing loaded from storage has been verified yet
+        blockchain.invalidate_verification()
+        return blockchain
+    
+    @classmethod
+    def from_storage(cls, chain, difficulty, transaction_count=0):
+        """Create Blockchain over a storage-backed block sequence such as LazyChain.
+        
+        The sequence attaches the blocks it loads to its owner. The transaction
+        count comes from storage too, so nothing here reads the blocks. No block
+        is trusted as verified until validation has run over it.
+        """
+        blockchain = cls()
+        blockchain.chain = chain
+        chain.owner = blockchain
+        blockchain.difficulty = difficulty
+        blockchain._transaction_count = transaction_count
+        # Indexing reads every block, so defer it until the first lookup
+        blockchain._indexed = False
+        blockchain.invalidate_verification()
         return blockchain
\ No newline at end of file
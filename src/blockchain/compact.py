@@ -0,0 +1,108 @@
+import sys
+from datetime import datetime, timedelta
+from src.blockchain import merkle
+
+# Timestamps are naive ISO strings from datetime.now(); store them as microseconds since this epoch
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+def pack_hex(value):
+    """Store a lowercase hex string as bytes; anything that would not round-trip is kept as is"""
+    if isinstance(value, str) and len(value) % 2 == 0:
+        try:
+            packed = bytes.fromhex(value)
+        except ValueError:
+            return value
+        if packed.hex() == value:
+            return packed
+    return value
+
+def unpack_hex(value):
+    """Hex view of a value stored by pack_hex"""
+    return value.hex() if isinstance(value, bytes) else value
+
+def pack_timestamp(value):
+    """Store an ISO timestamp as integer microseconds when it round-trips exactly"""
+    if isinstance(value, str):
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if moment.tzinfo is None and moment.isoformat() == value:
+            return (moment - EPOCH) // MICROSECOND
+        return value
+    # Wrap non-string timestamps so they cannot be mistaken for packed ones
+    return (value,)
+
+def unpack_timestamp(value):
+    """ISO view of a value stored by pack_timestamp"""
+    if isinstance(value, int):
+        return (EPOCH + timedelta(microseconds=value)).isoformat()
+    if isinstance(value, tuple):
+        return value[0]
+    return value
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Transaction:
+    """Compact EMR transaction: slots, binary hex fields, integer timestamp, interned ids"""
+
+    __slots__ = ('type', 'patient_id', 'doctor_id', '_ipfs_hash',
+                 '_encrypted_session_key', '_signature', '_timestamp')
+
+    # Field order of Blockchain.create_emr_transaction
+    FIELDS = ('type', 'patient_id', 'doctor_id', 'ipfs_hash',
+              'encrypted_session_key', 'signature', 'timestamp')
+    FIELD_SET = frozenset(FIELDS)
+
+    def __init__(self, type, patient_id, doctor_id, ipfs_hash, encrypted_session_key, signature, timestamp):
+        self.type = _intern(type)
+        self.patient_id = _intern(patient_id)
+        self.doctor_id = _intern(doctor_id)
+        self._ipfs_hash = pack_hex(ipfs_hash)
+        self._encrypted_session_key = pack_hex(encrypted_session_key)
+        self._signature = pack_hex(signature)
+        self._timestamp = pack_timestamp(timestamp)
+
+    @classmethod
+    def can_compact(cls, data):
+        """Whether a transaction dict has exactly the EMR fields"""
+        return isinstance(data, dict) and data.keys() == cls.FIELD_SET
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create Transaction from dictionary"""
+        return cls(*(data[field] for field in cls.FIELDS))
+
+    @property
+    def ipfs_hash(self):
+        return unpack_hex(self._ipfs_hash)
+
+    @property
+    def encrypted_session_key(self):
+        return unpack_hex(self._encrypted_session_key)
+
+    @property
+    def signature(self):
+        return unpack_hex(self._signature)
+
+    @property
+    def timestamp(self):
+        return unpack_timestamp(self._timestamp)
+
+    def to_dict(self):
+        """Dictionary view for hashing, storage and the GUI"""
+        return {
+            "type": self.type,
+            "patient_id": self.patient_id,
+            "doctor_id": self.doctor_id,
+            "ipfs_hash": self.ipfs_hash,
+            "encrypted_session_key": self.encrypted_session_key,
+            "signature": self.signature,
+            "timestamp": self.timestamp
+        }
+    
+    def leaf_hash(self):
+        """Merkle leaf hash; not kept, so a resident chain pays nothing for it after validation"""
+        return merkle.leaf_hash(self.to_dict())
@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import Future
+from src.utils import canonical
+
+class Mempool:
+    """Queues transactions and seals them into blocks by count, byte size or wait time"""
+
+    def __init__(self, blockchain, max_transactions=500, max_bytes=1024 * 1024, max_wait=2.0, on_commit=None):
+        self.blockchain = blockchain
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.max_wait = max_wait
+        self.on_commit = on_commit
+
+        self._condition = threading.Condition()
+        self._seal_lock = threading.Lock()
+        self._pending = []  # (transaction, size, future)
+        self._pending_bytes = 0
+        self._oldest = None
+        self._closed = False
+
+        self._builder = threading.Thread(target=self._run, name="mempool-block-builder", daemon=True)
+        self._builder.start()
+
+    def submit(self, transaction):
+        """Queue a transaction; the returned Future resolves to the Block that commits it"""
+        size = len(canonical.encode(transaction))
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise Exception("Mempool is closed")
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((transaction, size, future))
+            self._pending_bytes += size
+            self._condition.notify()
+        return future
+
+    def pending_count(self):
+        """Number of transactions waiting for a block"""
+        with self._condition:
+            return len(self._pending)
+
+    def flush(self):
+        """Seal everything pending now, in the caller's thread"""
+        while True:
+            with self._condition:
+                batch = self._take_batch()
+            if not batch:
+                return
+            self._seal(batch)
+
+    def close(self):
+        """Stop accepting transactions, seal what is pending and stop the builder"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._builder.join()
+
+    def _is_ready(self):
+        if not self._pending:
+            return False
+        return (len(self._pending) >= self.max_transactions
+                or self._pending_bytes >= self.max_bytes
+                or time.monotonic() - self._oldest >= self.max_wait)
+
+    def _take_batch(self):
+        """Remove the next block's worth of transactions; caller holds the condition"""
+        count = 0
+        batch_bytes = 0
+        for _, size, _ in self._pending:
+            if count and (count >= self.max_transactions or batch_bytes + size > self.max_bytes):
+                break
+            count += 1
+            batch_bytes += size
+
+        batch = self._pending[:count]
+        del self._pending[:count]
+        self._pending_bytes -= batch_bytes
+        # Remaining transactions start a fresh wait window
+        self._oldest = time.monotonic() if self._pending else None
+        return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._is_ready() and not self._closed:
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0.0, self._oldest + self.max_wait - time.monotonic())
+                    self._condition.wait(timeout)
+                if self._closed and not self._pending:
+                    return
+                batch = self._take_batch()
+            self._seal(batch)
+
+    def _seal(self, batch):
+        """Mine one block for the batch and resolve every caller's future"""
+        transactions = [transaction for transaction, _, _ in batch]
+        try:
+            with self._seal_lock:
+                block = self.blockchain.add_block(transactions)
+                if self.on_commit:
+                    self.on_commit(block)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+        else:
+            for _, _, future in batch:
+                future.set_result(block)
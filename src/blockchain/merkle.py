@@ -0,0 +1,53 @@
+import hashlib
+from src.utils import canonical
+
+# Leaves and inner nodes are hashed with different prefixes so one can't pass for the other
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def leaf_hash(transaction):
+    """Hash of one transaction as a Merkle leaf"""
+    return hashlib.sha256(LEAF_PREFIX + canonical.encode(transaction)).digest()
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def _next_level(level):
+    # An odd node out is carried up unchanged rather than paired with a copy of itself
+    return [node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)]
+
+def merkle_root(leaves):
+    """Root of a list of leaf hashes, as raw bytes"""
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    level = list(leaves)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+def merkle_path(leaves, position):
+    """Sibling hashes from a leaf up to the root, each tagged with the side it sits on"""
+    path = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            path.append({
+                "hash": level[sibling].hex(),
+                "position": "left" if sibling < position else "right"
+            })
+        level = _next_level(level)
+        position //= 2
+    return path
+
+def root_from_path(leaf, path):
+    """Fold a leaf hash up a Merkle path to the root it implies"""
+    current = leaf
+    for step in path:
+        sibling = bytes.fromhex(step["hash"])
+        if step["position"] == "left":
+            current = node_hash(sibling, current)
+        else:
+            current = node_hash(current, sibling)
+    return current
@@ -0,0 +1,113 @@
+import hashlib
+import multiprocessing
+from src.utils import canonical
+
+class MiningEngine:
+    """Proof-of-work search that serializes the block once and hashes only the nonce per attempt"""
+
+    def __init__(self, prefix, suffix, difficulty):
+        """Prepare the SHA-256 midstate for the serialized bytes around the nonce"""
+        self.prefix = prefix
+        self.suffix = suffix
+        self.difficulty = difficulty
+        self.midstate = hashlib.sha256(prefix)
+        # A hex target of N zeros is N // 2 zero bytes plus one high nibble when N is odd
+        self.zero_bytes, self.half_byte = divmod(difficulty, 2)
+
+    @classmethod
+    def for_header(cls, fields, difficulty):
+        """Create an engine for a block header given without its nonce"""
+        prefix, suffix = cls.split_serialization(fields)
+        return cls(prefix, suffix, difficulty)
+
+    @classmethod
+    def for_block(cls, block, difficulty):
+        """Create an engine from a block's cached header serialization"""
+        prefix, suffix = block.header_serialization()
+        return cls(prefix, suffix, difficulty)
+
+    @staticmethod
+    def split_serialization(fields):
+        """Split the canonical encoding of fields + nonce into the bytes before and after the nonce"""
+        return canonical.split_around(fields, "nonce")
+
+    def hash_nonce(self, nonce):
+        """Hash the block for a single nonce, equal to Block.calculate_hash()"""
+        sha = self.midstate.copy()
+        sha.update(b"%d" % nonce + self.suffix)
+        return sha.hexdigest()
+
+    def search(self, start=0, stop=None):
+        """Return (nonce, hash) for the first valid nonce in [start, stop), or None if exhausted"""
+        midstate = self.midstate
+        suffix = self.suffix
+        zero_bytes = self.zero_bytes
+        zero_prefix = bytes(zero_bytes)
+        half_byte = self.half_byte
+
+        nonce = start
+        while stop is None or nonce < stop:
+            sha = midstate.copy()
+            sha.update(b"%d" % nonce + suffix)
+            digest = sha.digest()
+            if digest[:zero_bytes] == zero_prefix and (not half_byte or digest[zero_bytes] < 16):
+                return nonce, sha.hexdigest()
+            nonce += 1
+        return None
+
+# Set in each pool worker so every search can see when another worker has won
+_stop_event = None
+
+def _init_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+def _search_batches(job):
+    """Search every workers-th batch of nonces until a hash is found or the pool is told to stop"""
+    prefix, suffix, difficulty, start, worker, workers, batch_size = job
+    engine = MiningEngine(prefix, suffix, difficulty)
+    batch_start = start + worker * batch_size
+    while not _stop_event.is_set():
+        found = engine.search(batch_start, batch_start + batch_size)
+        if found:
+            _stop_event.set()
+            return found
+        batch_start += workers * batch_size
+    return None
+
+class ParallelMiner:
+    """Mines a block by splitting its nonce space across a pool of worker processes"""
+
+    def __init__(self, workers=1, min_difficulty=5, batch_size=4096):
+        self.workers = max(1, workers)
+        self.min_difficulty = min_difficulty
+        self.batch_size = batch_size
+
+    def mine(self, block, difficulty):
+        """Mine block in place and return it"""
+        # Pool startup costs more than an easy search, so mine those in-process
+        if self.workers < 2 or difficulty < self.min_difficulty:
+            block.mine_block(difficulty)
+            return block
+
+        engine = MiningEngine.for_block(block, difficulty)
+        jobs = [
+            (engine.prefix, engine.suffix, difficulty, block.nonce, worker, self.workers, self.batch_size)
+            for worker in range(self.workers)
+        ]
+
+        context = multiprocessing.get_context()
+        stop_event = context.Event()
+        found = None
+        with context.Pool(self.workers, initializer=_init_worker, initargs=(stop_event,)) as pool:
+            for result in pool.imap_unordered(_search_batches, jobs):
+                if result:
+                    found = result
+                    break
+            # Leaving the block terminates the losing workers
+            stop_event.set()
+
+        if not found:
+            raise Exception("Parallel mining stopped without finding a valid nonce")
+        block.nonce, block.hash = found
+        return block
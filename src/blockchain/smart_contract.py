@@ -1,12 +1,22 @@
 import json
 from src.crypto.ecc_manager import ECCManager
+from src.crypto.key_generator import KeyGenerator
+from src.crypto.batch_verifier import BatchVerifier
+from src.utils.config import Config
 
 class SmartContract:
-    def __init__(self, blockchain, patient_manager, doctor_manager):
+    def __init__(self, blockchain, patient_manager, doctor_manager, mempool=None, record_cache=None):
         self.blockchain = blockchain
+        self.mempool = mempool
+        # Decrypted records that must not outlive a doctor's access
+        self.record_cache = record_cache
         self.patient_manager = patient_manager
         self.doctor_manager = doctor_manager
         self.ecc_manager = ECCManager()
+        self.batch_verifier = BatchVerifier(
+            Config.SIGNATURE_VERIFY_WORKERS, Config.PARALLEL_VERIFY_MIN_BATCH,
+            verification_cache=ECCManager.verification_cache
+        )
     
     def verify_access_permission(self, doctor_id, patient_id):
         """Verify if doctor has access to patient's records"""
@@ -15,17 +25,30 @@ class SmartContract:
             return False
         return patient.has_access(doctor_id)
     
+    @staticmethod
+    def signed_fields(transaction):
+        """The part of an EMR transaction that the doctor signs"""
+        return {
+            "patient_id": transaction.get('patient_id'),
+            "doctor_id": transaction.get('doctor_id'),
+            "ipfs_hash": transaction.get('ipfs_hash'),
+            "encrypted_session_key": transaction.get('encrypted_session_key')
+        }
+    
     def verify_emr_signature(self, transaction_data, signature, doctor_public_key_str):
         """Verify EMR transaction signature"""
-        doctor_public_key = self.doctor_manager.get_doctor_public_key(doctor_public_key_str)
-        if not doctor_public_key:
+        doctor = self.doctor_manager.get_doctor_public_key(doctor_public_key_str)
+        if not doctor:
             return False
         
+        # Resolve the parsed key object through the key cache
+        doctor_public_key = KeyGenerator.string_to_public_key(doctor.public_key)
+        
         # Verify the signature
         return self.ecc_manager.verify_signature(transaction_data, signature, doctor_public_key)
     
-    def process_emr_creation(self, patient_id, doctor_id, ipfs_hash, encrypted_key, signature):
-        """Process EMR creation with smart contract logic"""
+    def validate_emr_creation(self, patient_id, doctor_id, ipfs_hash, encrypted_key, signature):
+        """Run the smart contract checks for an EMR creation, raising on failure"""
         # Verify doctor has access
         if not self.verify_access_permission(doctor_id, patient_id):
             raise Exception("Doctor does not have access to patient records")
@@ -46,12 +69,110 @@ class SmartContract:
         # Verify signature
         if not self.verify_emr_signature(transaction_data, signature, doctor.public_key):
             raise Exception("Invalid signature")
+    
+    def process_emr_creation(self, patient_id, doctor_id, ipfs_hash, encrypted_key, signature):
+        """Process EMR creation with smart contract logic"""
+        self.validate_emr_creation(patient_id, doctor_id, ipfs_hash, encrypted_key, signature)
         
         # Add to blockchain
         return self.blockchain.add_emr_transaction(
             patient_id, doctor_id, ipfs_hash, encrypted_key, signature
         )
     
+    def submit_emr_creation(self, patient_id, doctor_id, ipfs_hash, encrypted_key, signature):
+        """Validate an EMR creation and queue it in the mempool; returns a Future of its Block"""
+        if not self.mempool:
+            raise Exception("No mempool configured for batched EMR creation")
+        self.validate_emr_creation(patient_id, doctor_id, ipfs_hash, encrypted_key, signature)
+        
+        transaction = self.blockchain.create_emr_transaction(
+            patient_id, doctor_id, ipfs_hash, encrypted_key, signature
+        )
+        return self.mempool.submit(transaction)
+    
+    def process_emr_batch(self, transactions):
+        """Verify a batch of EMR creations in parallel and commit the accepted ones in one block.
+        
+        Each transaction is a dict with patient_id, doctor_id, ipfs_hash,
+        encrypted_session_key and signature. Returns one result per transaction,
+        in order, with 'accepted', a 'reason' for rejections and the
+        'block_index' that committed accepted ones.
+        """
+        results = []
+        jobs = []
+        for transaction in transactions:
+            result = {'transaction': transaction, 'accepted': False, 'reason': None, 'block_index': None}
+            results.append(result)
+            
+            # Access and doctor checks are cheap, so they run before any signature work
+            doctor = self.doctor_manager.get_doctor(transaction.get('doctor_id'))
+            if not doctor:
+                result['reason'] = "Doctor not found"
+            elif not self.verify_access_permission(transaction.get('doctor_id'), transaction.get('patient_id')):
+                result['reason'] = "Doctor does not have access to patient records"
+            else:
+                payload = self.ecc_manager.signing_payload(self.signed_fields(transaction))
+                jobs.append((result, (payload, transaction.get('signature') or "", doctor.public_key)))
+        
+        # Verify all remaining signatures together; one bad signature only rejects its own record
+        verdicts = self.batch_verifier.verify_all(job for _, job in jobs)
+        accepted = []
+        for (result, _), valid in zip(jobs, verdicts):
+            if valid:
+                accepted.append(result)
+            else:
+                result['reason'] = "Invalid signature"
+        
+        if accepted:
+            block = self.blockchain.add_block([
+                self.blockchain.create_emr_transaction(
+                    result['transaction']['patient_id'],
+                    result['transaction']['doctor_id'],
+                    result['transaction']['ipfs_hash'],
+                    result['transaction']['encrypted_session_key'],
+                    result['transaction']['signature']
+                )
+                for result in accepted
+            ])
+            for result in accepted:
+                result['accepted'] = True
+                result['block_index'] = block.index
+        
+        return results
+    
+    def audit_signatures(self):
+        """Re-verify the signature of every EMR transaction on the chain.
+        
+        Signatures proven by an earlier audit or validation come from the
+        verification cache. Returns counts and the location of each failure.
+        """
+        report = {'checked': 0, 'valid': 0, 'invalid': []}
+        jobs = []
+        with self.blockchain.lock:
+            for block_index in range(1, len(self.blockchain.chain)):
+                block = self.blockchain.chain[block_index]
+                for offset in range(block.transaction_count()):
+                    transaction = block.get_transaction(offset)
+                    if not isinstance(transaction, dict) or transaction.get("type") != "EMR_CREATION":
+                        continue
+                    report['checked'] += 1
+                    location = {'block_index': block_index, 'transaction_index': offset}
+                    doctor = self.doctor_manager.get_doctor(transaction.get('doctor_id'))
+                    if not doctor:
+                        report['invalid'].append(dict(location, reason="Doctor not found"))
+                        continue
+                    payload = self.ecc_manager.signing_payload(self.signed_fields(transaction))
+                    jobs.append((location, (payload, transaction.get('signature') or "", doctor.public_key)))
+        
+        verdicts = self.batch_verifier.verify_all(job for _, job in jobs)
+        for (location, _), valid in zip(jobs, verdicts):
+            if valid:
+                report['valid'] += 1
+            else:
+                report['invalid'].append(dict(location, reason="Invalid signature"))
+        report['invalid'].sort(key=lambda entry: (entry['block_index'], entry['transaction_index']))
+        return report
+    
     def grant_access(self, patient_id, doctor_id):
         """Grant access to doctor through smart contract"""
         patient = self.patient_manager.get_patient(patient_id)
@@ -66,6 +187,8 @@ class SmartContract:
         patient = self.patient_manager.get_patient(patient_id)
         if patient:
             patient.revoke_access(doctor_id)
+            if self.record_cache is not None:
+                self.record_cache.purge(patient_id, doctor_id)
             self.patient_manager.save_patients()
             return True
         return False
\ No newline at end of file
@@ -0,0 +1,77 @@
+import multiprocessing
+from src.blockchain.blockchain_core import Block
+
+# With the fork start method workers inherit the chain instead of receiving pickled blocks
+_shared_chain = None
+
+def _check_blocks(blocks, start, previous_hash):
+    """Return the index of the first invalid block in a contiguous run starting at start, or None"""
+    for i, block in enumerate(blocks, start):
+        if block.hash != block.calculate_hash():
+            return i
+        if not block.has_valid_merkle_root():
+            return i
+        # The first block links to the last block of the previous range
+        if block.previous_hash != previous_hash:
+            return i
+        previous_hash = block.hash
+    return None
+
+def _check_range(job):
+    start, stop, previous_hash, block_dicts = job
+    if block_dicts is None:
+        blocks = (_shared_chain[i] for i in range(start, stop))
+    else:
+        blocks = (Block.from_dict(block_data) for block_data in block_dicts)
+    return _check_blocks(blocks, start, previous_hash)
+
+class ParallelChainValidator:
+    """Recomputes block hashes and links for contiguous chain ranges in worker processes"""
+
+    def __init__(self, workers=1, min_blocks=5000, ranges_per_worker=4):
+        self.workers = max(1, workers)
+        self.min_blocks = min_blocks
+        self.ranges_per_worker = ranges_per_worker
+
+    def find_invalid_block(self, chain):
+        """Return the index of the first invalid block in the chain, or None if it is valid"""
+        global _shared_chain
+        length = len(chain)
+        if length < 2:
+            return None
+
+        if self.workers < 2 or length < self.min_blocks:
+            return _check_blocks((chain[i] for i in range(1, length)), 1, chain[0].hash)
+
+        # Contiguous ranges, several per worker so a slow range doesn't hold up the rest
+        range_count = self.workers * self.ranges_per_worker
+        range_size = max(1, -(-(length - 1) // range_count))
+        bounds = [(start, min(start + range_size, length)) for start in range(1, length, range_size)]
+
+        context = multiprocessing.get_context()
+        share_memory = context.get_start_method() == "fork"
+        jobs = []
+        for start, stop in bounds:
+            block_dicts = None if share_memory else [chain[i].to_dict() for i in range(start, stop)]
+            jobs.append((start, stop, chain[start - 1].hash, block_dicts))
+
+        if share_memory:
+            _shared_chain = chain
+        try:
+            with context.Pool(self.workers) as pool:
+                # Results arrive in chain order, so the first failure is the lowest invalid index
+                for result in pool.imap(_check_range, jobs):
+                    if result is not None:
+                        return result
+        finally:
+            _shared_chain = None
+        return None
+
+    def validate(self, chain):
+        """Audit the chain and report the first invalid index alongside the verdict"""
+        first_invalid = self.find_invalid_block(chain)
+        return {
+            'valid': first_invalid is None,
+            'first_invalid_index': first_invalid,
+            'blocks_checked': len(chain)
+        }
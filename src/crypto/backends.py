@@ -0,0 +1,125 @@
+import hashlib
+from ecdsa import SigningKey, SECP256k1, VerifyingKey
+from ecdsa.ellipticcurve import PointJacobi
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
+# Both backends use the ecdsa package's formats: secp256k1, hex of the raw 32-byte
+# private scalar and 64-byte x||y public point, and SHA-1 signatures as raw r||s
+COORDINATE_SIZE = 32
+
+class EcdsaBackend:
+    """Pure-Python signing with the ecdsa package"""
+
+    name = "ecdsa"
+
+    def generate_key_pair(self):
+        private_key = SigningKey.generate(curve=SECP256k1)
+        return private_key, private_key.get_verifying_key()
+
+    def private_key_to_bytes(self, private_key):
+        return private_key.to_string()
+
+    def public_key_to_bytes(self, public_key):
+        return public_key.to_string()
+
+    def load_private_key(self, raw):
+        return SigningKey.from_string(raw, curve=SECP256k1)
+
+    def load_public_key(self, raw):
+        return VerifyingKey.from_string(raw, curve=SECP256k1)
+
+    def sign(self, private_key, payload):
+        return private_key.sign(payload, hashfunc=hashlib.sha1)
+
+    def verify(self, public_key, signature, payload):
+        try:
+            return public_key.verify(signature, payload, hashfunc=hashlib.sha1)
+        except Exception:
+            return False
+
+    def precompute(self, public_key):
+        """Give a verifying key ecdsa's precomputed multiplication tables.
+
+        VerifyingKey.precompute() needs the point's order, which keys parsed
+        with from_string do not carry, so the point is rebuilt with it here.
+        """
+        point = public_key.pubkey.point
+        precomputed = PointJacobi(
+            public_key.curve.curve, point.x(), point.y(), 1,
+            public_key.curve.order, generator=True
+        )
+        precomputed * 2  # Builds the tables now rather than on first verify
+        public_key.pubkey.point = precomputed
+        return True
+
+class CryptographyBackend:
+    """OpenSSL signing through the cryptography package"""
+
+    name = "cryptography"
+
+    def __init__(self):
+        if not CRYPTOGRAPHY_AVAILABLE:
+            raise Exception("The cryptography package is required for the cryptography backend")
+        self.curve = ec.SECP256K1()
+        self.algorithm = ec.ECDSA(hashes.SHA1())
+
+    def generate_key_pair(self):
+        private_key = ec.generate_private_key(self.curve)
+        return private_key, private_key.public_key()
+
+    def private_key_to_bytes(self, private_key):
+        return private_key.private_numbers().private_value.to_bytes(COORDINATE_SIZE, "big")
+
+    def public_key_to_bytes(self, public_key):
+        # Drop the 0x04 uncompressed-point prefix to match ecdsa's raw encoding
+        return public_key.public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+        )[1:]
+
+    def load_private_key(self, raw):
+        if len(raw) != COORDINATE_SIZE:
+            raise Exception("Invalid private key length")
+        return ec.derive_private_key(int.from_bytes(raw, "big"), self.curve)
+
+    def load_public_key(self, raw):
+        if len(raw) != 2 * COORDINATE_SIZE:
+            raise Exception("Invalid public key length")
+        return ec.EllipticCurvePublicKey.from_encoded_point(self.curve, b"\x04" + raw)
+
+    def sign(self, private_key, payload):
+        r, s = decode_dss_signature(private_key.sign(payload, self.algorithm))
+        return r.to_bytes(COORDINATE_SIZE, "big") + s.to_bytes(COORDINATE_SIZE, "big")
+
+    def verify(self, public_key, signature, payload):
+        if len(signature) != 2 * COORDINATE_SIZE:
+            return False
+        r = int.from_bytes(signature[:COORDINATE_SIZE], "big")
+        s = int.from_bytes(signature[COORDINATE_SIZE:], "big")
+        try:
+            public_key.verify(encode_dss_signature(r, s), payload, self.algorithm)
+            return True
+        except (InvalidSignature, ValueError):
+            return False
+
+    def precompute(self, public_key):
+        # OpenSSL keeps its own tables; there is nothing to add per key
+        return False
+
+BACKENDS = {
+    EcdsaBackend.name: EcdsaBackend,
+    CryptographyBackend.name: CryptographyBackend
+}
+
+def get_backend(name):
+    """Instantiate the signing backend registered under name"""
+    if name not in BACKENDS:
+        raise Exception(f"Unknown crypto backend: {name}")
+    return BACKENDS[name]()
@@ -0,0 +1,58 @@
+import multiprocessing
+from .key_generator import KeyGenerator
+from .verification_cache import VerificationCache
+
+def _verify_one(job):
+    """Verify one (payload bytes, signature hex, public key hex) job"""
+    payload, signature, public_key_str = job
+    try:
+        # Each worker process keeps its own parsed-key cache
+        public_key = KeyGenerator.string_to_public_key(public_key_str)
+        return KeyGenerator.backend.verify(public_key, bytes.fromhex(signature), payload)
+    except Exception:
+        return False
+
+def _cache_key(job):
+    payload, signature, public_key_str = job
+    try:
+        return VerificationCache.entry_key(payload, bytes.fromhex(signature), bytes.fromhex(public_key_str))
+    except (TypeError, ValueError):
+        return None
+
+class BatchVerifier:
+    """Verifies many ECDSA signatures across a pool of worker processes"""
+
+    def __init__(self, workers=1, min_batch=32, chunksize=16, verification_cache=None):
+        self.workers = max(1, workers)
+        self.min_batch = min_batch
+        self.chunksize = chunksize
+        # Signatures proven before are not verified again
+        self.verification_cache = verification_cache
+
+    def _verify_uncached(self, jobs):
+        # Small batches are verified in-process; pool startup would cost more than it saves
+        if self.workers < 2 or len(jobs) < self.min_batch:
+            return [_verify_one(job) for job in jobs]
+
+        context = multiprocessing.get_context()
+        with context.Pool(self.workers) as pool:
+            return pool.map(_verify_one, jobs, self.chunksize)
+
+    def verify_all(self, jobs):
+        """Return one boolean per (payload, signature, public key) job, in order"""
+        jobs = list(jobs)
+        if self.verification_cache is None:
+            return self._verify_uncached(jobs)
+
+        keys = [_cache_key(job) for job in jobs]
+        results = [key is not None and self.verification_cache.contains(key) for key in keys]
+        pending = [position for position, cached in enumerate(results) if not cached]
+        verdicts = self._verify_uncached([jobs[position] for position in pending])
+
+        proven = []
+        for position, valid in zip(pending, verdicts):
+            results[position] = valid
+            if valid and keys[position] is not None:
+                proven.append(keys[position])
+        self.verification_cache.add(*proven)
+        return results
@@ -1,34 +1,48 @@
-from ecdsa import SigningKey, SECP256k1, VerifyingKey
-import hashlib
 import json
+from src.utils import canonical
+from src.utils.config import Config
 from .key_generator import KeyGenerator
+from .stream_cipher import StreamCipher
+from .verification_cache import VerificationCache
 
 class ECCManager:
+    # Signatures already verified successfully, shared by every manager in the process
+    verification_cache = VerificationCache(Config.VERIFICATION_CACHE_FILE)
+    
     def __init__(self):
-        self.curve = SECP256k1
+        self.backend = KeyGenerator.backend
+        self.stream_cipher = None
+    
+    @staticmethod
+    def signing_payload(data):
+        """Bytes that are signed for data"""
+        return canonical.encode_payload(data)
     
     def sign_data(self, data, private_key):
         """Sign data using ECDSA"""
-        if isinstance(data, dict):
-            data = json.dumps(data, sort_keys=True)
-        signature = private_key.sign(data.encode())
+        signature = self.backend.sign(private_key, self.signing_payload(data))
         return signature.hex()
     
     def verify_signature(self, data, signature, public_key):
-        """Verify ECDSA signature"""
-        if isinstance(data, dict):
-            data = json.dumps(data, sort_keys=True)
+        """Verify ECDSA signature, skipping the math for signatures already proven"""
         try:
-            public_key.verify(bytes.fromhex(signature), data.encode())
+            payload = self.signing_payload(data)
+            signature_bytes = bytes.fromhex(signature)
+            cache_key = self.verification_cache.entry_key(
+                payload, signature_bytes, self.backend.public_key_to_bytes(public_key)
+            )
+            if self.verification_cache.contains(cache_key):
+                return True
+            if not self.backend.verify(public_key, signature_bytes, payload):
+                return False
+            self.verification_cache.add(cache_key)
             return True
         except:
             return False
     
     def hash_data(self, data):
         """Create SHA-256 hash of data"""
-        if isinstance(data, dict):
-            data = json.dumps(data, sort_keys=True)
-        return hashlib.sha256(data.encode()).hexdigest()
+        return canonical.hexdigest(data)
     
     def encrypt_emr(self, emr_data, patient_public_key_str):
         """Encrypt EMR data using hybrid encryption"""
@@ -42,4 +56,20 @@ class ECCManager:
         """Decrypt EMR data"""
         return KeyGenerator.decrypt_with_private_key(
             encrypted_data, encrypted_key, doctor_private_key
-        )
\ No newline at end of file
+        )
+    
+    def _get_stream_cipher(self):
+        if self.stream_cipher is None:
+            self.stream_cipher = StreamCipher(Config.STREAM_CHUNK_SIZE)
+        return self.stream_cipher
+    
+    def encrypt_emr_stream(self, source, destination, patient_public_key_str):
+        """Encrypt a large EMR payload from one file-like object into another.
+        
+        Returns the ephemeral public key hex that stands in for the encrypted session key.
+        """
+        return self._get_stream_cipher().encrypt(source, destination, patient_public_key_str)
+    
+    def decrypt_emr_stream(self, source, destination, private_key_str):
+        """Decrypt a stream written by encrypt_emr_stream"""
+        self._get_stream_cipher().decrypt(source, destination, private_key_str)
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+class KeyCache:
+    """Bounded LRU of parsed ECC key objects, keyed by their hex encoding.
+
+    Keys are parsed by the configured crypto backend. Verifying keys that are
+    used often get the backend's precomputed tables where it has them, which
+    roughly halves ecdsa verification time for the clinicians who sign most.
+    """
+
+    SIGNING = "signing"
+    VERIFYING = "verifying"
+
+    def __init__(self, backend, max_size=1024, precompute_threshold=16, max_precomputed=64):
+        self.backend = backend
+        self.max_size = max_size
+        self.precompute_threshold = precompute_threshold
+        self.max_precomputed = max_precomputed
+        self.lock = threading.Lock()
+        # (kind, hex) -> [key object, uses, precomputed]
+        self._entries = OrderedDict()
+        self._precomputed = 0
+
+    def _get(self, kind, key_hex, parse):
+        with self.lock:
+            entry = self._entries.get((kind, key_hex))
+            if entry is not None:
+                self._entries.move_to_end((kind, key_hex))
+                entry[1] += 1
+                self._maybe_precompute(kind, entry)
+                return entry[0]
+
+        # Parse outside the lock; a racing thread may parse the same key, which is harmless
+        key = parse(bytes.fromhex(key_hex))
+        with self.lock:
+            entry = self._entries.setdefault((kind, key_hex), [key, 0, False])
+            entry[1] += 1
+            while len(self._entries) > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                if evicted[2]:
+                    self._precomputed -= 1
+            return entry[0]
+
+    def _maybe_precompute(self, kind, entry):
+        if kind != self.VERIFYING or entry[2] or entry[1] < self.precompute_threshold:
+            return
+        if self._precomputed >= self.max_precomputed:
+            return
+        entry[2] = True
+        try:
+            if not self.backend.precompute(entry[0]):
+                return
+        except Exception:
+            return
+        self._precomputed += 1
+
+    def signing_key(self, priv_hex):
+        """Parsed private key object for a hex private key"""
+        return self._get(self.SIGNING, priv_hex, self.backend.load_private_key)
+
+    def verifying_key(self, pub_hex):
+        """Parsed public key object for a hex public key"""
+        return self._get(self.VERIFYING, pub_hex, self.backend.load_public_key)
+
+    def invalidate(self, *key_hexes):
+        """Drop cached keys, e.g. the old pair after a key rotation"""
+        with self.lock:
+            for key_hex in key_hexes:
+                for kind in (self.SIGNING, self.VERIFYING):
+                    entry = self._entries.pop((kind, key_hex), None)
+                    if entry and entry[2]:
+                        self._precomputed -= 1
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self._precomputed = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,30 +1,75 @@
-from ecdsa import SigningKey, SECP256k1, VerifyingKey
 import hashlib
 import base64
 import os
+from src.utils.config import Config
+from .backends import get_backend
+from .key_cache import KeyCache
+from .key_pool import KeyPool
+
+def _generate_key_strings(_):
+    return KeyGenerator.generate_key_strings()
 
 class KeyGenerator:
+    # Signing backend, and the parsed key objects shared by every sign and verify in the process
+    backend = get_backend(Config.CRYPTO_BACKEND)
+    key_cache = KeyCache(backend, Config.KEY_CACHE_SIZE, Config.KEY_PRECOMPUTE_THRESHOLD, Config.KEY_PRECOMPUTE_MAX)
+    # Key pairs generated ahead of registrations; the filler thread starts on first use or start()
+    key_pool = KeyPool(lambda: KeyGenerator.generate_key_strings(),
+                       Config.KEY_POOL_LOW_WATERMARK, Config.KEY_POOL_HIGH_WATERMARK)
+    # Bulk generation hands this many key pairs to each pool task; smaller requests run in-process
+    BULK_CHUNK_SIZE = 64
+    
     @staticmethod
     def generate_ecc_key_pair():
         """Generate ECC key pair using secp256k1 curve"""
-        private_key = SigningKey.generate(curve=SECP256k1)
-        public_key = private_key.get_verifying_key()
-        return private_key, public_key
+        return KeyGenerator.backend.generate_key_pair()
+    
+    @staticmethod
+    def generate_key_strings():
+        """Generate a key pair already converted to its stored string form"""
+        return KeyGenerator.keys_to_string(*KeyGenerator.generate_ecc_key_pair())
+    
+    @staticmethod
+    def generate_key_strings_bulk(count, pool=None, chunksize=BULK_CHUNK_SIZE):
+        """Generate count key pairs as strings, across a multiprocessing pool when one is given"""
+        if pool is None or count < chunksize:
+            return [KeyGenerator.generate_key_strings() for _ in range(count)]
+        return pool.map(_generate_key_strings, range(count), chunksize)
+    
+    @staticmethod
+    def new_key_strings():
+        """Key pair strings for a new entity, from the pre-generated pool when it has one"""
+        return KeyGenerator.key_pool.take()
     
     @staticmethod
     def keys_to_string(private_key, public_key):
         """Convert keys to string format for storage"""
-        priv_str = private_key.to_string().hex()
-        pub_str = public_key.to_string().hex()
+        priv_str = KeyGenerator.backend.private_key_to_bytes(private_key).hex()
+        pub_str = KeyGenerator.backend.public_key_to_bytes(public_key).hex()
         return priv_str, pub_str
     
     @staticmethod
     def string_to_keys(priv_str, pub_str):
         """Convert string back to key objects"""
-        private_key = SigningKey.from_string(bytes.fromhex(priv_str), curve=SECP256k1)
-        public_key = VerifyingKey.from_string(bytes.fromhex(pub_str), curve=SECP256k1)
+        private_key = KeyGenerator.string_to_private_key(priv_str)
+        public_key = KeyGenerator.string_to_public_key(pub_str)
         return private_key, public_key
     
+    @staticmethod
+    def string_to_private_key(priv_str):
+        """Convert a private key string to a (cached) backend key object"""
+        return KeyGenerator.key_cache.signing_key(priv_str)
+    
+    @staticmethod
+    def string_to_public_key(pub_str):
+        """Convert a public key string to a (cached) backend key object"""
+        return KeyGenerator.key_cache.verifying_key(pub_str)
+    
+    @staticmethod
+    def invalidate_keys(*key_strs):
+        """Forget cached key objects, called when an entity rotates its keys"""
+        KeyGenerator.key_cache.invalidate(*[key for key in key_strs if key])
+    
     @staticmethod
     def generate_symmetric_key():
         """Generate symmetric key for session encryption"""
@@ -0,0 +1,67 @@
+import threading
+from collections import deque
+
+class KeyPool:
+    """Key pairs generated ahead of time by a background thread.
+
+    The pool refills up to high_watermark whenever it drops below low_watermark,
+    so registration bursts take ready-made keys instead of waiting on keygen.
+    When the pool runs dry a pair is generated inline.
+    """
+
+    def __init__(self, generate, low_watermark=16, high_watermark=64):
+        # generate() returns a (private key string, public key string) pair
+        self.generate = generate
+        self.low_watermark = low_watermark
+        self.high_watermark = max(high_watermark, low_watermark)
+        self._pairs = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._filler = None
+
+    def start(self):
+        """Start filling the pool in the background; safe to call more than once"""
+        with self._condition:
+            if self._filler is not None or self._closed or self.high_watermark <= 0:
+                return
+            self._filler = threading.Thread(target=self._run, name="key-pool-filler", daemon=True)
+            self._filler.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and len(self._pairs) >= self.low_watermark:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                missing = self.high_watermark - len(self._pairs)
+            # Generate outside the lock so take() never waits on keygen
+            for _ in range(missing):
+                pair = self.generate()
+                with self._condition:
+                    if self._closed:
+                        return
+                    self._pairs.append(pair)
+
+    def take(self):
+        """Take a key pair, generating one inline if the pool is empty"""
+        with self._condition:
+            pair = self._pairs.popleft() if self._pairs else None
+            if len(self._pairs) < self.low_watermark:
+                self._condition.notify()
+        if pair is None:
+            self.start()
+            pair = self.generate()
+        return pair
+
+    def close(self):
+        """Stop the background filler and drop the unused keys"""
+        with self._condition:
+            self._closed = True
+            self._pairs.clear()
+            self._condition.notify_all()
+        if self._filler is not None:
+            self._filler.join()
+
+    def __len__(self):
+        return len(self._pairs)
@@ -0,0 +1,120 @@
+import os
+import struct
+from .backends import CRYPTOGRAPHY_AVAILABLE, CryptographyBackend
+
+if CRYPTOGRAPHY_AVAILABLE:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+class StreamCipher:
+    """ECIES-style hybrid encryption of file-like streams in constant memory.
+
+    An ephemeral secp256k1 key is agreed with the recipient's public key (ECDH),
+    HKDF-SHA256 turns the shared secret into an AES-256 key, and the stream is
+    sealed as AES-GCM chunks. Each chunk nonce carries its counter and a
+    final-chunk flag, so reordered, dropped or truncated chunks fail to decrypt.
+
+    Layout: header (magic, ephemeral public key, salt, nonce prefix, chunk size),
+    then per chunk a 4-byte ciphertext length and the ciphertext with its tag.
+    The header is the associated data of every chunk.
+    """
+
+    MAGIC = b"EMRSTRM1"
+    HEADER = struct.Struct(">8s64s16s7sI")
+    LENGTH = struct.Struct(">I")
+    KDF_INFO = b"EMR stream encryption"
+    TAG_SIZE = 16
+    MAX_CHUNKS = 2 ** 32
+
+    def __init__(self, chunk_size=65536):
+        if not CRYPTOGRAPHY_AVAILABLE:
+            raise Exception("The cryptography package is required for stream encryption")
+        self.chunk_size = chunk_size
+        self.keys = CryptographyBackend()
+
+    def _derive_key(self, private_key, public_key, salt):
+        shared_secret = private_key.exchange(ec.ECDH(), public_key)
+        return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=self.KDF_INFO).derive(shared_secret)
+
+    @staticmethod
+    def _nonce(prefix, counter, final):
+        return prefix + struct.pack(">IB", counter, 1 if final else 0)
+
+    def encrypt(self, source, destination, recipient_public_key_str):
+        """Encrypt source into destination for the holder of a public key.
+
+        Returns the ephemeral public key as hex, which identifies the session key.
+        """
+        recipient_key = self.keys.load_public_key(bytes.fromhex(recipient_public_key_str))
+        ephemeral_key, ephemeral_public = self.keys.generate_key_pair()
+        salt = os.urandom(16)
+        nonce_prefix = os.urandom(7)
+        aead = AESGCM(self._derive_key(ephemeral_key, recipient_key, salt))
+
+        ephemeral_public_bytes = self.keys.public_key_to_bytes(ephemeral_public)
+        header = self.HEADER.pack(self.MAGIC, ephemeral_public_bytes, salt, nonce_prefix, self.chunk_size)
+        destination.write(header)
+
+        # Read one chunk ahead so the last chunk can be sealed with the final flag
+        counter = 0
+        chunk = source.read(self.chunk_size)
+        while True:
+            following = source.read(self.chunk_size) if chunk else b""
+            final = not following
+            if counter >= self.MAX_CHUNKS:
+                raise Exception("Stream too long to encrypt")
+            sealed = aead.encrypt(self._nonce(nonce_prefix, counter, final), chunk, header)
+            destination.write(self.LENGTH.pack(len(sealed)))
+            destination.write(sealed)
+            if final:
+                break
+            chunk = following
+            counter += 1
+
+        return ephemeral_public_bytes.hex()
+
+    def _read_exact(self, source, size):
+        data = source.read(size)
+        if len(data) != size:
+            raise Exception("Encrypted stream is truncated")
+        return data
+
+    def decrypt(self, source, destination, private_key_str):
+        """Decrypt a stream written by encrypt into destination.
+
+        Chunks are written as they are authenticated; if this raises, whatever
+        reached destination must be discarded.
+        """
+        header = self._read_exact(source, self.HEADER.size)
+        magic, ephemeral_public_bytes, salt, nonce_prefix, chunk_size = self.HEADER.unpack(header)
+        if magic != self.MAGIC:
+            raise Exception("Not an encrypted EMR stream")
+
+        private_key = self.keys.load_private_key(bytes.fromhex(private_key_str))
+        ephemeral_public = self.keys.load_public_key(ephemeral_public_bytes)
+        aead = AESGCM(self._derive_key(private_key, ephemeral_public, salt))
+        max_sealed = chunk_size + self.TAG_SIZE
+
+        counter = 0
+        length_bytes = self._read_exact(source, self.LENGTH.size)
+        while True:
+            (length,) = self.LENGTH.unpack(length_bytes)
+            if length > max_sealed:
+                raise Exception("Encrypted stream chunk is too large")
+            sealed = self._read_exact(source, length)
+            # A chunk is final exactly when nothing follows it
+            length_bytes = source.read(self.LENGTH.size)
+            final = not length_bytes
+            try:
+                chunk = aead.decrypt(self._nonce(nonce_prefix, counter, final), sealed, header)
+            except InvalidTag:
+                raise Exception("Encrypted stream failed authentication")
+            destination.write(chunk)
+            if final:
+                return
+            if len(length_bytes) != self.LENGTH.size:
+                raise Exception("Encrypted stream is truncated")
+            counter += 1
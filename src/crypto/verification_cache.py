@@ -0,0 +1,90 @@
+import hashlib
+import os
+import threading
+
+class VerificationCache:
+    """Persistent set of signatures already verified successfully.
+
+    Each entry is sha256(sha256(payload) || signature || public key), 32 bytes,
+    appended to a flat file behind an 8-byte magic header. Only successful
+    verifications are recorded: a forged signature can never be cached into
+    validity, and a hit proves this exact payload, signature and key checked out.
+    """
+
+    MAGIC = b"EMRVSIG1"
+    ENTRY_SIZE = 32
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._entries = None  # Loaded on first use
+        self._file = None
+
+    @classmethod
+    def entry_key(cls, payload, signature, public_key):
+        """Cache key for payload bytes, a signature and a public key (both raw bytes)"""
+        return hashlib.sha256(hashlib.sha256(payload).digest() + signature + public_key).digest()
+
+    def _load(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = b""
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        if data[:len(self.MAGIC)] != self.MAGIC:
+            # Missing or unrecognized file: start an empty one
+            data = self.MAGIC
+            with open(self.path, 'wb') as f:
+                f.write(data)
+
+        body = memoryview(data)[len(self.MAGIC):]
+        whole = len(body) - len(body) % self.ENTRY_SIZE
+        if whole != len(body):
+            # A torn final entry from a crash is dropped
+            with open(self.path, 'r+b') as f:
+                f.truncate(len(self.MAGIC) + whole)
+        self._entries = {bytes(body[i:i + self.ENTRY_SIZE]) for i in range(0, whole, self.ENTRY_SIZE)}
+        self._file = open(self.path, 'ab')
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            self._load()
+
+    def contains(self, key):
+        with self.lock:
+            self._ensure_loaded()
+            return key in self._entries
+
+    def add(self, *keys):
+        """Record successful verifications"""
+        with self.lock:
+            self._ensure_loaded()
+            new_keys = [key for key in keys if key not in self._entries]
+            if not new_keys:
+                return
+            self._entries.update(new_keys)
+            self._file.write(b"".join(new_keys))
+            self._file.flush()
+
+    def clear(self):
+        """Forget every recorded verification, on disk too"""
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'wb') as f:
+                f.write(self.MAGIC)
+            self._entries = set()
+            self._file = open(self.path, 'ab')
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+            self._entries = None
+
+    def __len__(self):
+        with self.lock:
+            self._ensure_loaded()
+            return len(self._entries)
@@ -64,7 +64,7 @@ class AdminPortal:
         total_patients = len(self.healthcare_system.patient_manager.patients)
         total_doctors = len(self.healthcare_system.doctor_manager.doctors)
         total_blocks = len(self.healthcare_system.blockchain.chain)
-        total_transactions = sum(len(block.data) if isinstance(block.data, list) else 1 for block in self.healthcare_system.blockchain.chain[1:])
+        total_transactions = self.healthcare_system.blockchain.transaction_count()
         chain_valid = self.healthcare_system.blockchain.is_chain_valid()
         
         stats_text.insert(tk.END, 
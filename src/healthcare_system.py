@@ -1,5 +1,9 @@
+import asyncio
 import json
 import os
+import multiprocessing
+import threading
+from itertools import islice
 from datetime import datetime
 
 # Use relative imports for Python 3.13 compatibility
@@ -12,7 +16,12 @@ try:
     from .crypto.key_generator import KeyGenerator
     from .blockchain.blockchain_core import Blockchain
     from .blockchain.smart_contract import SmartContract
+    from .blockchain.mempool import Mempool
+    from .blockchain.validation import ParallelChainValidator
     from .storage.ipfs_simulator import IPFSSimulator
+    from .storage.block_log import BlockLog
+    from .storage.lazy_chain import LazyChain
+    from .storage.record_cache import DecryptedRecordCache
 except ImportError:
     # Fallback for direct execution
     from utils.config import Config
@@ -23,11 +32,71 @@ except ImportError:
     from crypto.key_generator import KeyGenerator
     from blockchain.blockchain_core import Blockchain
     from blockchain.smart_contract import SmartContract
+    from blockchain.mempool import Mempool
+    from blockchain.validation import ParallelChainValidator
     from storage.ipfs_simulator import IPFSSimulator
+    from storage.block_log import BlockLog
+    from storage.lazy_chain import LazyChain
+    from storage.record_cache import DecryptedRecordCache
+
+def register_bulk(records, fields, registry, public_key_index, create, save, batch_size, workers, progress):
+    """Register records in batches: duplicate checks, parallel keygen and one save per batch.
+    
+    registry maps ids to entities and create(record) builds an entity without keys.
+    Returns {'registered': count, 'duplicates': [ids], 'invalid': [positions]}.
+    """
+    id_field = fields[0]
+    result = {'registered': 0, 'duplicates': [], 'invalid': []}
+    records = iter(records)
+    position = 0
+    
+    # Started by the first batch large enough to use it
+    pool = None
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            
+            accepted = []
+            seen = set()
+            for record in batch:
+                if not isinstance(record, dict) or any(field not in record for field in fields):
+                    result['invalid'].append(position)
+                elif record[id_field] in registry or record[id_field] in seen:
+                    result['duplicates'].append(record[id_field])
+                else:
+                    seen.add(record[id_field])
+                    accepted.append(record)
+                position += 1
+            
+            if pool is None and workers > 1 and len(accepted) >= KeyGenerator.BULK_CHUNK_SIZE:
+                pool = multiprocessing.get_context().Pool(workers)
+            key_pairs = KeyGenerator.generate_key_strings_bulk(len(accepted), pool)
+            for record, (private_key, public_key) in zip(accepted, key_pairs):
+                entity = create(record)
+                entity.private_key = private_key
+                entity.public_key = public_key
+                registry[record[id_field]] = entity
+                public_key_index[public_key] = entity
+            
+            if accepted:
+                save()
+            result['registered'] += len(accepted)
+            if progress:
+                progress(position, result['registered'])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    
+    return result
 
 class PatientManager:
     def __init__(self):
         self.patients = {}
+        # public key string -> Patient, kept in step with register, load and rotate_keys
+        self.public_key_index = {}
         self.load_patients()
     
     def register_patient(self, patient_id, name, age, gender, contact_info):
@@ -37,19 +106,54 @@ class PatientManager:
         
         patient = Patient(patient_id, name, age, gender, contact_info)
         self.patients[patient_id] = patient
+        self.public_key_index[patient.public_key] = patient
         self.save_patients()
         return patient
     
+    def register_patients_bulk(self, records, batch_size=None, progress=None):
+        """Register many patients from an iterable of dicts, saving once per batch.
+        
+        progress(records_seen, registered) is called after each batch.
+        """
+        return register_bulk(
+            records,
+            ('patient_id', 'name', 'age', 'gender', 'contact_info'),
+            self.patients,
+            self.public_key_index,
+            lambda record: Patient(record['patient_id'], record['name'], record['age'],
+                                   record['gender'], record['contact_info']),
+            self.save_patients,
+            batch_size or Config.BULK_REGISTRATION_BATCH_SIZE,
+            Config.KEYGEN_WORKERS,
+            progress
+        )
+    
     def get_patient(self, patient_id):
         """Get patient by ID"""
         return self.patients.get(patient_id)
     
     def get_patient_public_key(self, public_key_str):
         """Get patient by public key string"""
-        for patient in self.patients.values():
-            if patient.public_key == public_key_str:
-                return patient
-        return None
+        patient = self.public_key_index.get(public_key_str)
+        # Guards against keys rotated without going through rotate_keys
+        if patient is None or patient.public_key != public_key_str:
+            return None
+        return patient
+    
+    def rotate_keys(self, patient_id):
+        """Give a patient a new key pair and re-index it"""
+        patient = self.patients.get(patient_id)
+        if not patient:
+            return None
+        self.public_key_index.pop(patient.public_key, None)
+        patient.generate_keys()
+        self.public_key_index[patient.public_key] = patient
+        self.save_patients()
+        return patient
+    
+    def rebuild_public_key_index(self):
+        """Rebuild the public key index from the loaded patients"""
+        self.public_key_index = {patient.public_key: patient for patient in self.patients.values()}
     
     def save_patients(self):
         """Save patients to file"""
@@ -68,10 +172,13 @@ class PatientManager:
         except Exception as e:
             print(f"Error loading patients: {e}")
             self.patients = {}
+        self.rebuild_public_key_index()
 
 class DoctorManager:
     def __init__(self):
         self.doctors = {}
+        # public key string -> Doctor, kept in step with register, load and rotate_keys
+        self.public_key_index = {}
         self.load_doctors()
     
     def register_doctor(self, doctor_id, name, specialization, license_number, hospital):
@@ -81,19 +188,54 @@ class DoctorManager:
         
         doctor = Doctor(doctor_id, name, specialization, license_number, hospital)
         self.doctors[doctor_id] = doctor
+        self.public_key_index[doctor.public_key] = doctor
         self.save_doctors()
         return doctor
     
+    def register_doctors_bulk(self, records, batch_size=None, progress=None):
+        """Register many doctors from an iterable of dicts, saving once per batch.
+        
+        progress(records_seen, registered) is called after each batch.
+        """
+        return register_bulk(
+            records,
+            ('doctor_id', 'name', 'specialization', 'license_number', 'hospital'),
+            self.doctors,
+            self.public_key_index,
+            lambda record: Doctor(record['doctor_id'], record['name'], record['specialization'],
+                                  record['license_number'], record['hospital']),
+            self.save_doctors,
+            batch_size or Config.BULK_REGISTRATION_BATCH_SIZE,
+            Config.KEYGEN_WORKERS,
+            progress
+        )
+    
     def get_doctor(self, doctor_id):
         """Get doctor by ID"""
         return self.doctors.get(doctor_id)
     
     def get_doctor_public_key(self, public_key_str):
         """Get doctor by public key string"""
-        for doctor in self.doctors.values():
-            if doctor.public_key == public_key_str:
-                return doctor
-        return None
+        doctor = self.public_key_index.get(public_key_str)
+        # Guards against keys rotated without going through rotate_keys
+        if doctor is None or doctor.public_key != public_key_str:
+            return None
+        return doctor
+    
+    def rotate_keys(self, doctor_id):
+        """Give a doctor a new key pair and re-index it"""
+        doctor = self.doctors.get(doctor_id)
+        if not doctor:
+            return None
+        self.public_key_index.pop(doctor.public_key, None)
+        doctor.generate_keys()
+        self.public_key_index[doctor.public_key] = doctor
+        self.save_doctors()
+        return doctor
+    
+    def rebuild_public_key_index(self):
+        """Rebuild the public key index from the loaded doctors"""
+        self.public_key_index = {doctor.public_key: doctor for doctor in self.doctors.values()}
     
     def save_doctors(self):
         """Save doctors to file"""
@@ -112,21 +254,53 @@ class DoctorManager:
         except Exception as e:
             print(f"Error loading doctors: {e}")
             self.doctors = {}
+        self.rebuild_public_key_index()
 
 class HealthcareSystem:
     def __init__(self):
         self.patient_manager = PatientManager()
         self.doctor_manager = DoctorManager()
+        self.block_log = None
+        if Config.BLOCKCHAIN_STORAGE == "log":
+            self.block_log = BlockLog(
+                Config.BLOCKCHAIN_LOG_FILE,
+                Config.BLOCKCHAIN_INDEX_FILE,
+                Config.BLOCK_LOG_COMPACT_INTERVAL,
+                Config.BLOCK_LOG_COMPACT_RATIO
+            )
         self.blockchain = self.load_blockchain()
         self.ipfs = IPFSSimulator()
+        self.ipfs.migrate_in_background()
         self.ecc_manager = ECCManager()
-        self.smart_contract = SmartContract(self.blockchain, self.patient_manager, self.doctor_manager)
+        self.mempool = Mempool(
+            self.blockchain,
+            max_transactions=Config.MEMPOOL_MAX_TRANSACTIONS,
+            max_bytes=Config.MEMPOOL_MAX_BYTES,
+            max_wait=Config.MEMPOOL_MAX_WAIT,
+            on_commit=lambda block: self.save_blockchain()
+        )
+        self.record_cache = DecryptedRecordCache(Config.RECORD_CACHE_MAX_BYTES, Config.RECORD_CACHE_TTL)
+        self.smart_contract = SmartContract(
+            self.blockchain, self.patient_manager, self.doctor_manager, self.mempool, self.record_cache
+        )
+        self.chain_validator = ParallelChainValidator(
+            Config.VALIDATION_WORKERS, Config.PARALLEL_VALIDATION_MIN_BLOCKS
+        )
+        # Nothing loaded from disk is trusted: verify the whole chain off the startup path.
+        # Until the audit raises the watermark, is_chain_valid() checks the blocks itself.
+        self.chain_audit = threading.Thread(target=self.audit_loaded_chain, name="chain-audit", daemon=True)
+        self.chain_audit.start()
+        # Have key pairs ready before the first registration
+        KeyGenerator.key_pool.start()
         
         # Initialize with sample data if empty
         self.initialize_sample_data()
     
     def load_blockchain(self):
         """Load blockchain from file or create new"""
+        if self.block_log is not None:
+            return self.load_blockchain_log()
+        
         try:
             if os.path.exists(Config.BLOCKCHAIN_FILE):
                 with open(Config.BLOCKCHAIN_FILE, 'r') as f:
@@ -137,13 +311,63 @@ class HealthcareSystem:
         
         return Blockchain()
     
+    def load_blockchain_log(self):
+        """Load blockchain from the append-only block log, migrating the JSON file once"""
+        # Difficulty 0 would mine without proof-of-work; refuse to start instead of falling back
+        if not isinstance(Config.DIFFICULTY, int) or Config.DIFFICULTY < 1:
+            raise Exception(f"Config.DIFFICULTY must be a positive integer, not {Config.DIFFICULTY!r}")
+        try:
+            if not self.block_log.exists() and os.path.exists(Config.BLOCKCHAIN_FILE):
+                print(f"Migrating {Config.BLOCKCHAIN_FILE} to block log...")
+                self.block_log.migrate_json(Config.BLOCKCHAIN_FILE)
+            else:
+                self.block_log.open()
+            
+            if not Config.LAZY_BLOCK_LOADING:
+                if len(self.block_log):
+                    return Blockchain.from_dict(self.block_log.read_chain_dict())
+                return Blockchain()
+            
+            if not len(self.block_log):
+                # Persist a genesis block so the chain can be served from the log
+                self.block_log.sync(Blockchain())
+            chain = LazyChain(self.block_log, Config.BLOCK_CACHE_SIZE)
+            return Blockchain.from_storage(
+                chain,
+                self.block_log.difficulty,
+                self.block_log.transaction_count
+            )
+        
+        except Exception as e:
+            if self.block_log.exists():
+                # The log is the chain of record; any JSON file left beside it is stale
+                raise Exception(f"Cannot open block log {Config.BLOCKCHAIN_LOG_FILE}: {e}") from e
+            # No log was written, so the JSON file is still current
+            print(f"Error creating block log: {e}")
+            self.block_log = None
+            return self.load_blockchain()
+    
     def save_blockchain(self):
         """Save blockchain to file"""
+        if self.block_log is not None:
+            # Only blocks the log does not have yet are written
+            with self.blockchain.lock:
+                self.block_log.sync(self.blockchain)
+            return
+        
         os.makedirs(os.path.dirname(Config.BLOCKCHAIN_FILE), exist_ok=True)
-        with open(Config.BLOCKCHAIN_FILE, 'w') as f:
+        with self.blockchain.lock:
             data = self.blockchain.to_dict()
+        with open(Config.BLOCKCHAIN_FILE, 'w') as f:
             json.dump(data, f, indent=2)
     
+    def shutdown(self):
+        """Seal any queued EMR transactions, stop the block builder and key pool, and close IPFS storage"""
+        self.mempool.close()
+        self.chain_audit.join()
+        KeyGenerator.key_pool.close()
+        self.ipfs.close()
+    
     def initialize_sample_data(self):
         """Initialize with sample data for demo"""
         if not self.patient_manager.patients:
@@ -185,50 +409,56 @@ class HealthcareSystem:
         """Revoke doctor access to patient records"""
         return self.smart_contract.revoke_access(patient_id, doctor_id)
     
+    def prepare_medical_record(self, record_id, patient_id, doctor_id, diagnosis, prescription, notes):
+        """Encrypt, store and sign a medical record; returns the EMR transaction arguments"""
+        # Get patient and doctor
+        patient = self.patient_manager.get_patient(patient_id)
+        doctor = self.doctor_manager.get_doctor(doctor_id)
+        
+        if not patient or not doctor:
+            raise Exception("Patient or doctor not found")
+        
+        # Check if doctor has access
+        if not patient.has_access(doctor_id):
+            raise Exception("Doctor does not have access to patient records")
+        
+        # Create medical record
+        medical_record = MedicalRecord(record_id, patient_id, doctor_id, diagnosis, prescription, notes)
+        
+        # Convert doctor private key string back to object
+        doctor_private_key = KeyGenerator.string_to_private_key(doctor.private_key)
+        
+        # Encrypt EMR data
+        emr_data = medical_record.to_dict()
+        encrypted_emr, encrypted_session_key = self.ecc_manager.encrypt_emr(emr_data, patient.public_key)
+        
+        # Store encrypted EMR on IPFS
+        ipfs_hash = self.ipfs.store_data(encrypted_emr)
+        medical_record.ipfs_hash = ipfs_hash
+        medical_record.encrypted_session_key = encrypted_session_key
+        
+        # Create transaction data for signing
+        transaction_data = {
+            "patient_id": patient_id,
+            "doctor_id": doctor_id,
+            "ipfs_hash": ipfs_hash,
+            "encrypted_session_key": encrypted_session_key
+        }
+        
+        # Sign the transaction
+        signature = self.ecc_manager.sign_data(transaction_data, doctor_private_key)
+        
+        return patient_id, doctor_id, ipfs_hash, encrypted_session_key, signature
+    
     def create_medical_record(self, record_id, patient_id, doctor_id, diagnosis, prescription, notes):
         """Create and store a medical record on blockchain"""
         try:
-            # Get patient and doctor
-            patient = self.patient_manager.get_patient(patient_id)
-            doctor = self.doctor_manager.get_doctor(doctor_id)
-            
-            if not patient or not doctor:
-                raise Exception("Patient or doctor not found")
-            
-            # Check if doctor has access
-            if not patient.has_access(doctor_id):
-                raise Exception("Doctor does not have access to patient records")
-            
-            # Create medical record
-            medical_record = MedicalRecord(record_id, patient_id, doctor_id, diagnosis, prescription, notes)
-            
-            # Convert doctor private key string back to object
-            doctor_private_key, _ = KeyGenerator.string_to_keys(doctor.private_key, doctor.public_key)
-            
-            # Encrypt EMR data
-            emr_data = medical_record.to_dict()
-            encrypted_emr, encrypted_session_key = self.ecc_manager.encrypt_emr(emr_data, patient.public_key)
-            
-            # Store encrypted EMR on IPFS
-            ipfs_hash = self.ipfs.store_data(encrypted_emr)
-            medical_record.ipfs_hash = ipfs_hash
-            medical_record.encrypted_session_key = encrypted_session_key
-            
-            # Create transaction data for signing
-            transaction_data = {
-                "patient_id": patient_id,
-                "doctor_id": doctor_id,
-                "ipfs_hash": ipfs_hash,
-                "encrypted_session_key": encrypted_session_key
-            }
-            
-            # Sign the transaction
-            signature = self.ecc_manager.sign_data(transaction_data, doctor_private_key)
+            emr_args = self.prepare_medical_record(
+                record_id, patient_id, doctor_id, diagnosis, prescription, notes
+            )
             
             # Process through smart contract and add to blockchain
-            self.smart_contract.process_emr_creation(
-                patient_id, doctor_id, ipfs_hash, encrypted_session_key, signature
-            )
+            self.smart_contract.process_emr_creation(*emr_args)
             
             # Save blockchain state
             self.save_blockchain()
@@ -239,15 +469,63 @@ class HealthcareSystem:
             print(f"Error creating medical record: {e}")
             return False
     
+    def create_medical_records_batch(self, records):
+        """Create many medical records, verifying signatures in parallel and committing one block.
+        
+        records is a list of dicts with the create_medical_record arguments.
+        Returns one smart contract result per record, in order.
+        """
+        results = [None] * len(records)
+        prepared = []
+        for position, record in enumerate(records):
+            try:
+                patient_id, doctor_id, ipfs_hash, encrypted_session_key, signature = self.prepare_medical_record(
+                    record['record_id'], record['patient_id'], record['doctor_id'],
+                    record['diagnosis'], record['prescription'], record['notes']
+                )
+                prepared.append((position, {
+                    'patient_id': patient_id,
+                    'doctor_id': doctor_id,
+                    'ipfs_hash': ipfs_hash,
+                    'encrypted_session_key': encrypted_session_key,
+                    'signature': signature
+                }))
+            except Exception as e:
+                results[position] = {'transaction': record, 'accepted': False, 'reason': str(e), 'block_index': None}
+        
+        contract_results = self.smart_contract.process_emr_batch([transaction for _, transaction in prepared])
+        for (position, _), result in zip(prepared, contract_results):
+            results[position] = result
+        
+        if any(result['accepted'] for result in contract_results):
+            self.save_blockchain()
+        return results
+    
+    def submit_medical_record(self, record_id, patient_id, doctor_id, diagnosis, prescription, notes):
+        """Queue a medical record for the next batched block.
+        
+        Returns a Future that resolves to the committing Block once the block is
+        mined and saved, or None if the record was rejected.
+        """
+        try:
+            emr_args = self.prepare_medical_record(
+                record_id, patient_id, doctor_id, diagnosis, prescription, notes
+            )
+            return self.smart_contract.submit_emr_creation(*emr_args)
+        
+        except Exception as e:
+            print(f"Error submitting medical record: {e}")
+            return None
+    
     def get_patient_records(self, patient_id):
         """Get all medical records for a patient"""
         try:
             records = []
             transactions = self.blockchain.get_emr_transactions(patient_id=patient_id)
             
-            for transaction in transactions:
+            for position, transaction in enumerate(transactions, 1):
                 record_data = {
-                    'record_id': f"EMR_{transaction['patient_id']}_{transactions.index(transaction) + 1}",
+                    'record_id': f"EMR_{transaction['patient_id']}_{position}",
                     'patient_id': transaction['patient_id'],
                     'doctor_id': transaction['doctor_id'],
                     'diagnosis': "Encrypted - Requires decryption",
@@ -265,11 +543,25 @@ class HealthcareSystem:
             print(f"Error retrieving patient records: {e}")
             return []
     
+    def load_patient_records(self, patient_id):
+        """Patient records with their encrypted IPFS data, fetched concurrently.
+        
+        Each record gets 'encrypted_data', or 'error' if its CID could not be read.
+        """
+        records = self.get_patient_records(patient_id)
+        results = asyncio.run(self.ipfs.retrieve_many([record['ipfs_hash'] for record in records]))
+        for record, result in zip(records, results):
+            if isinstance(result, Exception):
+                record['error'] = str(result)
+            else:
+                record['encrypted_data'] = result
+        return records
+    
     def decrypt_medical_record(self, encrypted_data, encrypted_key, doctor_private_key_str):
         """Decrypt a medical record for authorized doctors"""
         try:
             # Convert doctor private key string back to object
-            doctor_private_key, _ = KeyGenerator.string_to_keys(doctor_private_key_str, "")
+            doctor_private_key = KeyGenerator.string_to_private_key(doctor_private_key_str)
             
             # Decrypt the data
             decrypted_data = self.ecc_manager.decrypt_emr(encrypted_data, encrypted_key, doctor_private_key)
@@ -278,6 +570,81 @@ class HealthcareSystem:
         except Exception as e:
             print(f"Error decrypting medical record: {e}")
             return None
+
+    def view_medical_record(self, doctor_id, ipfs_hash):
+        """Fetch and decrypt a record for a doctor, serving repeat views from the record cache"""
+        try:
+            transaction = self.blockchain.get_transaction_by_ipfs_hash(ipfs_hash)
+            if not transaction:
+                raise Exception("Record not found")
+            # Access is checked on every view, cached or not
+            if not self.smart_contract.verify_access_permission(doctor_id, transaction['patient_id']):
+                raise Exception("Doctor does not have access to patient records")
+            
+            plaintext = self.record_cache.get(doctor_id, ipfs_hash)
+            if plaintext is None:
+                doctor = self.doctor_manager.get_doctor(doctor_id)
+                if not doctor:
+                    raise Exception("Doctor not found")
+                doctor_private_key = KeyGenerator.string_to_private_key(doctor.private_key)
+                encrypted_data = self.ipfs.retrieve_data(ipfs_hash)
+                plaintext = self.ecc_manager.decrypt_emr(
+                    encrypted_data, transaction['encrypted_session_key'], doctor_private_key
+                )
+                self.record_cache.put(doctor_id, transaction['patient_id'], ipfs_hash, plaintext)
+            return json.loads(plaintext)
+        
+        except Exception as e:
+            print(f"Error viewing medical record: {e}")
+            return None
+
+    def store_medical_attachment(self, patient_id, source):
+        """Encrypt a large attachment (imaging, scans) for a patient straight into IPFS.
+
+        source is any binary file-like object; returns (ipfs_hash, session key) or None.
+        """
+        patient = self.patient_manager.get_patient(patient_id)
+        if not patient:
+            print("Error storing medical attachment: Patient not found")
+            return None
+
+        writer = self.ipfs.open_writer()
+        try:
+            session_key = self.ecc_manager.encrypt_emr_stream(source, writer, patient.public_key)
+            return writer.close(), session_key
+        except Exception as e:
+            writer.abort()
+            print(f"Error storing medical attachment: {e}")
+            return None
+
+    def retrieve_medical_attachment(self, ipfs_hash, private_key_str, destination):
+        """Decrypt an attachment from IPFS into a binary file-like object"""
+        try:
+            with self.ipfs.open_reader(ipfs_hash) as source:
+                self.ecc_manager.decrypt_emr_stream(source, destination, private_key_str)
+            return True
+        except Exception as e:
+            print(f"Error retrieving medical attachment: {e}")
+            return False
+
+    def audit_blockchain(self):
+        """Fully re-verify every block hash and link across worker processes"""
+        with self.blockchain.lock:
+            result = self.chain_validator.validate(self.blockchain.chain)
+            if result['valid']:
+                self.blockchain.mark_verified(result['blocks_checked'] - 1)
+        return result
+    
+    def audit_loaded_chain(self):
+        """Startup audit of the chain as loaded from storage"""
+        result = self.audit_blockchain()
+        if not result['valid']:
+            print(f"Blockchain audit: block {result['first_invalid_index']} is invalid")
+        return result
+    
+    def audit_signatures(self):
+        """Re-verify every EMR signature, reusing results proven by earlier audits"""
+        return self.smart_contract.audit_signatures()
     
     def get_system_stats(self):
         """Get system statistics"""
@@ -285,8 +652,7 @@ class HealthcareSystem:
             'total_patients': len(self.patient_manager.patients),
             'total_doctors': len(self.doctor_manager.doctors),
             'total_blocks': len(self.blockchain.chain),
-            'total_transactions': sum(len(block.data) if isinstance(block.data, list) else 1 
-                                   for block in self.blockchain.chain[1:]),
+            'total_transactions': self.blockchain.transaction_count(),
             'blockchain_valid': self.blockchain.is_chain_valid(),
             'latest_block_hash': self.blockchain.get_latest_block().hash
         }
\ No newline at end of file
@@ -9,14 +9,37 @@ class Patient:
         self.gender = gender
         self.contact_info = contact_info
         self.authorized_doctors = []
-        self.private_key = None
-        self.public_key = None
-        self.generate_keys()
+        # Keys are created on first access, so loading stored patients never runs keygen
+        self._private_key = None
+        self._public_key = None
+    
+    def _ensure_keys(self):
+        if self._private_key is None and self._public_key is None:
+            self._private_key, self._public_key = KeyGenerator.new_key_strings()
+    
+    @property
+    def private_key(self):
+        self._ensure_keys()
+        return self._private_key
+    
+    @private_key.setter
+    def private_key(self, value):
+        self._private_key = value
+    
+    @property
+    def public_key(self):
+        self._ensure_keys()
+        return self._public_key
+    
+    @public_key.setter
+    def public_key(self, value):
+        self._public_key = value
     
     def generate_keys(self):
         """Generate ECC key pair for patient"""
-        private_key, public_key = KeyGenerator.generate_ecc_key_pair()
-        self.private_key, self.public_key = KeyGenerator.keys_to_string(private_key, public_key)
+        # Rotating keys must not leave the old pair usable from the key cache
+        KeyGenerator.invalidate_keys(self._private_key, self._public_key)
+        self._private_key, self._public_key = KeyGenerator.new_key_strings()
     
     def grant_access(self, doctor_id):
         """Grant access to a doctor"""
@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import threading
+import zlib
+from array import array
+from src.utils.config import Config
+
+# Log: magic + generation, then records of (payload length, crc32) + JSON block
+LOG_MAGIC = b"EMRBLOG1"
+LOG_HEADER = struct.Struct(">8s8s")
+RECORD_HEADER = struct.Struct(">II")
+
+# Index: magic + generation + difficulty + committed log size + transaction count,
+# then (offset, length) per block
+INDEX_MAGIC = b"EMRBIDX3"
+INDEX_HEADER = struct.Struct(">8s8sQQQ")
+INDEX_ENTRY_SIZE = 16
+# Older index formats share this header prefix; only their difficulty is kept
+LEGACY_INDEX_MAGICS = (b"EMRBIDX1", b"EMRBIDX2")
+LEGACY_INDEX_HEADER = struct.Struct(">8s8sQQ")
+
+def count_transactions(block_dict):
+    """Transactions a stored block adds to the chain's count; the genesis block adds none"""
+    if block_dict["index"] == 0:
+        return 0
+    data = block_dict["data"]
+    return len(data) if isinstance(data, list) else 1
+
+class BlockLog:
+    """Append-only, length-prefixed block storage with an offset index.
+
+    Blocks are only ever appended. A save writes the blocks the log does not
+    have yet instead of the whole chain. If the in-memory chain diverges from
+    the log, the index is cut back to the common prefix and the replacement
+    blocks are appended. The orphaned records become dead bytes, and periodic
+    compaction reclaims them. Pending transactions are not persisted; they
+    live in the mempool until sealed.
+
+    The index header also carries the chain's transaction count, so a cold
+    start can report it without reading any block. Validity is never taken
+    from the index: a loaded chain is verified from its blocks.
+    """
+
+    def __init__(self, log_path, index_path, compact_interval=1000, compact_ratio=0.25):
+        self.log_path = log_path
+        self.index_path = index_path
+        self.compact_interval = compact_interval
+        self.compact_ratio = compact_ratio
+        self.lock = threading.RLock()
+
+        self.offsets = array('Q')
+        self.lengths = array('Q')
+        self.difficulty = None
+        self.generation = None
+        self.committed_size = 0
+        self.tip_hash = None
+        self.transaction_count = 0
+        self.appends_since_compaction = 0
+        self._log = None
+        self._map = None
+
+    def exists(self):
+        """Whether a block log has been written"""
+        return os.path.exists(self.log_path)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def open(self):
+        """Open the log, recovering from a torn final record or a stale index"""
+        with self.lock:
+            if not self.exists():
+                self._write_fresh([], Config.DIFFICULTY)
+            self._log = open(self.log_path, 'r+b')
+            magic, generation = LOG_HEADER.unpack(self._log.read(LOG_HEADER.size))
+            if magic != LOG_MAGIC:
+                raise Exception(f"{self.log_path} is not a block log")
+            self.generation = generation
+
+            if not self._load_index():
+                # Missing index, or one left over from before a compaction
+                self.offsets = array('Q')
+                self.lengths = array('Q')
+                self.committed_size = LOG_HEADER.size
+                self.transaction_count = 0
+            if not self.difficulty:
+                # Only the index records the difficulty; never rebuild it as 0, which would disable proof-of-work
+                print(f"Block log: difficulty unknown, using the configured difficulty {Config.DIFFICULTY}")
+                self.difficulty = Config.DIFFICULTY
+            self._recover_tail()
+            self.tip_hash = self.read_block_dict(len(self) - 1)["hash"] if len(self) else None
+        return self
+
+    def close(self):
+        with self.lock:
+            if self._map:
+                self._map.close()
+                self._map = None
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def _load_index(self):
+        """Read the offset index; returns False if it does not belong to this log"""
+        if not os.path.exists(self.index_path):
+            return False
+        self.difficulty = None
+        with open(self.index_path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+            if header[:8] in LEGACY_INDEX_MAGICS and len(header) >= LEGACY_INDEX_HEADER.size:
+                # Keep the difficulty of an older index; the rest is rebuilt from the log
+                _, generation, difficulty, _ = LEGACY_INDEX_HEADER.unpack_from(header)
+                if generation == self.generation:
+                    self.difficulty = difficulty or None
+                return False
+            if len(header) < INDEX_HEADER.size:
+                return False
+            magic, generation, difficulty, committed_size, transaction_count = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC or generation != self.generation:
+                return False
+            body = f.read()
+
+        # Drop a torn final entry
+        body = body[:len(body) - len(body) % INDEX_ENTRY_SIZE]
+        entries = array('Q')
+        entries.frombytes(body)
+        if sys.byteorder != 'little':
+            entries.byteswap()
+        self.offsets = entries[0::2]
+        self.lengths = entries[1::2]
+        # Indexes written before the difficulty was required may hold 0 for "unknown"
+        self.difficulty = difficulty or None
+        self.committed_size = committed_size
+        self.transaction_count = transaction_count
+
+        # Entries past the end of the log can only come from a truncated log file
+        log_size = os.path.getsize(self.log_path)
+        if self.offsets and self.offsets[-1] + self.lengths[-1] > log_size:
+            # The dropped blocks' transactions cannot be subtracted, so rebuild everything from the log
+            return False
+        return True
+
+    def _read_record_at(self, offset, limit):
+        """Read and check one record; returns (payload, record length) or None if torn"""
+        if offset + RECORD_HEADER.size > limit:
+            return None
+        self._log.seek(offset)
+        length, checksum = RECORD_HEADER.unpack(self._log.read(RECORD_HEADER.size))
+        if offset + RECORD_HEADER.size + length > limit:
+            return None
+        payload = self._log.read(length)
+        if zlib.crc32(payload) != checksum:
+            return None
+        return payload, RECORD_HEADER.size + length
+
+    def _recover_tail(self):
+        """Adopt complete records written after the last index commit and truncate a torn one"""
+        log_size = os.path.getsize(self.log_path)
+        offset = min(max(self.committed_size, LOG_HEADER.size), log_size)
+        adopted = False
+        while offset < log_size:
+            record = self._read_record_at(offset, log_size)
+            if record is None:
+                break
+            payload, record_length = record
+            block_dict = json.loads(payload)
+            if block_dict["index"] != len(self.offsets):
+                break
+            self.offsets.append(offset)
+            self.lengths.append(record_length)
+            self.transaction_count += count_transactions(block_dict)
+            offset += record_length
+            adopted = True
+
+        if offset < log_size:
+            print(f"Block log: truncating {log_size - offset} bytes of torn data")
+            self._log.truncate(offset)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        if adopted or offset != self.committed_size:
+            self.committed_size = offset
+            self._write_index()
+
+    def read_block_dict(self, position):
+        """Read one stored block as a dictionary through the memory map"""
+        with self.lock:
+            start = self.offsets[position] + RECORD_HEADER.size
+            end = self.offsets[position] + self.lengths[position]
+            # Appends grow the file past the mapped region, so remap on demand
+            if self._map is None or end > len(self._map):
+                if self._map:
+                    self._map.close()
+                self._map = mmap.mmap(self._log.fileno(), 0, access=mmap.ACCESS_READ)
+            payload = self._map[start:end]
+        return json.loads(payload)
+
+    def read_chain_dict(self):
+        """Read the whole chain in Blockchain.from_dict format"""
+        with self.lock:
+            return {
+                "chain": [self.read_block_dict(i) for i in range(len(self))],
+                "difficulty": self.difficulty,
+                "pending_transactions": []
+            }
+
+    @staticmethod
+    def _encode(block_dict):
+        payload = json.dumps(block_dict, separators=(',', ':')).encode()
+        return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def _index_header(self):
+        if not self.difficulty:
+            raise Exception("Refusing to persist the block log index without a mining difficulty")
+        return INDEX_HEADER.pack(
+            INDEX_MAGIC, self.generation, self.difficulty, self.committed_size, self.transaction_count
+        )
+
+    def _write_index(self):
+        """Rewrite the index file; it holds 16 bytes per block, so this stays small"""
+        entries = array('Q')
+        for offset, length in zip(self.offsets, self.lengths):
+            entries.append(offset)
+            entries.append(length)
+        if sys.byteorder != 'little':
+            entries.byteswap()
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(self._index_header())
+            f.write(entries.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.index_path)
+
+    def _append_index(self, start):
+        """Append index entries from start on and commit the new log size in the header"""
+        entries = array('Q')
+        for i in range(start, len(self.offsets)):
+            entries.append(self.offsets[i])
+            entries.append(self.lengths[i])
+        if sys.byteorder != 'little':
+            entries.byteswap()
+        with open(self.index_path, 'r+b') as f:
+            f.seek(INDEX_HEADER.size + start * INDEX_ENTRY_SIZE)
+            f.write(entries.tobytes())
+            f.truncate()
+            f.seek(0)
+            f.write(self._index_header())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _common_prefix(self, chain):
+        """Number of leading blocks the log and the chain agree on"""
+        common = min(len(self), len(chain))
+        if common and chain[common - 1].hash == (self.tip_hash if common == len(self) else None):
+            return common
+        while common and self.read_block_dict(common - 1)["hash"] != chain[common - 1].hash:
+            common -= 1
+        return common
+
+    def sync(self, blockchain):
+        """Persist the blocks of blockchain that the log does not have yet"""
+        with self.lock:
+            chain = blockchain.chain
+            common = self._common_prefix(chain)
+
+            if common < len(self) or blockchain.difficulty != self.difficulty:
+                # Cut the index back first so a crash can never resurrect the old branch
+                for i in range(common, len(self)):
+                    self.transaction_count -= count_transactions(self.read_block_dict(i))
+                del self.offsets[common:]
+                del self.lengths[common:]
+                self.difficulty = blockchain.difficulty
+                self.committed_size = os.path.getsize(self.log_path)
+                self._write_index()
+
+            if common == len(chain):
+                return 0
+            self.append_blocks([chain[i] for i in range(common, len(chain))])
+            return len(chain) - common
+
+    def append_blocks(self, blocks):
+        """Append blocks after the current tip and commit them to the index"""
+        with self.lock:
+            start = len(self.offsets)
+            self._log.seek(0, os.SEEK_END)
+            offset = self._log.tell()
+            for block in blocks:
+                block_dict = block.to_dict()
+                record = self._encode(block_dict)
+                self.transaction_count += count_transactions(block_dict)
+                self._log.write(record)
+                self.offsets.append(offset)
+                self.lengths.append(len(record))
+                offset += len(record)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+            self.committed_size = offset
+            self._append_index(start)
+            self.tip_hash = blocks[-1].hash
+
+            self.appends_since_compaction += len(blocks)
+            if self.appends_since_compaction >= self.compact_interval:
+                self.appends_since_compaction = 0
+                if self.dead_bytes() > self.compact_ratio * self.live_bytes():
+                    self.compact()
+
+    def live_bytes(self):
+        """Bytes of records referenced by the index"""
+        return sum(self.lengths)
+
+    def dead_bytes(self):
+        """Bytes of orphaned records that compaction would reclaim"""
+        return self.committed_size - LOG_HEADER.size - self.live_bytes()
+
+    def _write_fresh(self, block_dicts, difficulty):
+        """Write a new log and index under a new generation, replacing any existing ones"""
+        self.generation = os.urandom(8)
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        temp_path = self.log_path + ".tmp"
+        offsets = array('Q')
+        lengths = array('Q')
+        transaction_count = 0
+        with open(temp_path, 'wb') as f:
+            f.write(LOG_HEADER.pack(LOG_MAGIC, self.generation))
+            for block_dict in block_dicts:
+                record = self._encode(block_dict)
+                transaction_count += count_transactions(block_dict)
+                offsets.append(f.tell())
+                lengths.append(len(record))
+                f.write(record)
+            committed_size = f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+
+        # The log is replaced first; an index from the old generation is ignored and rebuilt
+        os.replace(temp_path, self.log_path)
+        self.offsets = offsets
+        self.lengths = lengths
+        self.difficulty = difficulty
+        self.committed_size = committed_size
+        self.transaction_count = transaction_count
+        self._write_index()
+
+    def compact(self):
+        """Rewrite the log with only the live records"""
+        with self.lock:
+            block_dicts = [self.read_block_dict(i) for i in range(len(self))]
+            self.close()
+            self._write_fresh(block_dicts, self.difficulty)
+            self._log = open(self.log_path, 'r+b')
+
+    def migrate_json(self, json_path):
+        """One-time conversion of a blockchain_data.json file into this log"""
+        with self.lock:
+            with open(json_path, 'r') as f:
+                data = json.load(f)
+            self.close()
+            self._write_fresh(data["chain"], data["difficulty"])
+            self.open()
+            # Archived so nothing can load the superseded JSON chain again
+            os.replace(json_path, json_path + ".migrated")
+        return self
@@ -1,45 +1,365 @@
+import asyncio
 import os
+import re
 import json
 import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.utils import canonical
 from src.utils.config import Config
+from src.storage.merkle_dag import DAGWriter, DAGReader, CHUNK, ROOT
+from src.storage.object_format import ObjectCodec
+from src.storage.pack_store import PackStore
+
+# Objects written before sharding sit directly in the storage directory as <cid>.<extension>
+FLAT_OBJECT = re.compile(r"^([0-9a-f]{64})\.(json|bin)$")
+CID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+SHARDED_OBJECT = re.compile(r"^([0-9a-f]{64})\.(\w+)$")
+# Extension of records stored in the binary object format
+OBJECT = "obj"
+
+class IPFSWriter(DAGWriter):
+    """Binary object being streamed into IPFS storage as a chunked Merkle-DAG; its CID is known once closed"""
+
+    def __init__(self, ipfs):
+        super().__init__(ipfs, ipfs.chunk_size)
+        ipfs._writer_started()
+        self.finished = False
+    
+    def close(self):
+        """Store the remaining chunk and the root node, and return the root CID"""
+        try:
+            return super().close()
+        finally:
+            self._finish()
+    
+    def abort(self):
+        """Stop writing; chunks already stored are left to collect_garbage"""
+        self._finish()
+    
+    def _finish(self):
+        if not self.finished:
+            self.finished = True
+            self.ipfs._writer_finished()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+class FileObjectStore:
+    """One file per object under the sharded layout (the "files" backend)"""
+
+    def __init__(self, ipfs):
+        self.ipfs = ipfs
+    
+    def has(self, cid, extension):
+        return self.ipfs.find_object(cid, extension) is not None
+    
+    def put(self, cid, extension, stored):
+        fd, temp_path = tempfile.mkstemp(dir=self.ipfs.storage_dir, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(stored)
+        self.ipfs.publish(temp_path, cid, extension)
+    
+    def get(self, cid, extension):
+        with self.ipfs._open_object(cid, extension, 'rb') as f:
+            return f.read()
+    
+    def delete(self, cid, extension):
+        deleted = False
+        for file_path in (self.ipfs.object_path(cid, extension), self.ipfs._flat_path(cid, extension)):
+            try:
+                os.remove(file_path)
+                deleted = True
+            except FileNotFoundError:
+                continue
+        return deleted
+    
+    def list(self, extension):
+        """CIDs of every stored object of one type"""
+        cids = []
+        for _, _, files in os.walk(self.ipfs.storage_dir):
+            for name in files:
+                match = SHARDED_OBJECT.match(name)
+                if match and match.group(2) == extension:
+                    cids.append(match.group(1))
+        return cids
+    
+    def close(self):
+        pass
 
 class IPFSSimulator:
     def __init__(self):
         self.storage_dir = Config.IPFS_STORAGE
+        # Objects live under <storage>/ab/cd/<cid>: shard_depth levels of shard_width hex characters
+        self.shard_depth = Config.IPFS_SHARD_DEPTH
+        self.shard_width = Config.IPFS_SHARD_WIDTH
+        # Binary objects and large records are split into chunks of this size
+        self.chunk_size = Config.IPFS_CHUNK_SIZE
+        # Binary object format, compressing each object when its size and entropy make it worthwhile
+        self.codec = ObjectCodec(
+            Config.IPFS_COMPRESS_MIN_SIZE, Config.IPFS_LZMA_MIN_SIZE, Config.IPFS_COMPRESS_MAX_ENTROPY
+        )
+        # Open writers hold chunks no root references yet, so garbage collection waits for them
+        self._writers = 0
+        self._collecting = False
+        self._writers_condition = threading.Condition()
+        # Async store/retrieve run the blocking file I/O on up to this many pool threads
+        self.io_concurrency = Config.IPFS_IO_CONCURRENCY
+        self._io_executor = None
+        self._io_lock = threading.Lock()
         os.makedirs(self.storage_dir, exist_ok=True)
+        # Records, chunks and DAG roots go to the configured object store;
+        # objects from before the binary format stay as json/bin files either way
+        if Config.IPFS_BACKEND == "pack":
+            self.objects = PackStore(
+                os.path.join(self.storage_dir, "packs"), Config.IPFS_PACK_MAX_SIZE, Config.IPFS_PACK_COMPACT_RATIO
+            )
+            self.objects.start_compactor()
+        elif Config.IPFS_BACKEND == "files":
+            self.objects = FileObjectStore(self)
+        else:
+            raise Exception(f"Unknown IPFS backend: {Config.IPFS_BACKEND}")
+    
+    def object_path(self, cid, extension):
+        """Sharded location of an object"""
+        shards = [cid[i * self.shard_width:(i + 1) * self.shard_width] for i in range(self.shard_depth)]
+        return os.path.join(self.storage_dir, *shards, f"{cid}.{extension}")
+    
+    def _flat_path(self, cid, extension):
+        return os.path.join(self.storage_dir, f"{cid}.{extension}")
+    
+    def find_object(self, cid, extension):
+        """Path of a stored object in either layout, or None"""
+        if not CID_PATTERN.match(cid or ""):
+            return None
+        sharded = self.object_path(cid, extension)
+        if os.path.exists(sharded):
+            return sharded
+        flat = self._flat_path(cid, extension)
+        if os.path.exists(flat):
+            return flat
+        # The migrator may have moved it between the two checks
+        return sharded if os.path.exists(sharded) else None
+    
+    def _open_object(self, cid, extension, mode):
+        # A second lookup covers an object migrated between finding and opening it
+        for _ in range(2):
+            file_path = self.find_object(cid, extension)
+            if file_path is None:
+                break
+            try:
+                return open(file_path, mode)
+            except FileNotFoundError:
+                continue
+        raise Exception(f"Data with CID {cid} not found")
+    
+    def publish(self, temp_path, cid, extension):
+        """Move a fully written temp file into place, or drop it if the CID is already stored"""
+        if self.find_object(cid, extension):
+            os.remove(temp_path)
+            return False
+        path = self.object_path(cid, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return True
+    
+    def has_object(self, cid, extension):
+        """Whether the object store holds an object of this type under the CID"""
+        return bool(CID_PATTERN.match(cid or "")) and self.objects.has(cid, extension)
+    
+    def put_object(self, data, extension):
+        """Store bytes under their sha256 CID unless an object with that CID already exists"""
+        cid = hashlib.sha256(data).hexdigest()
+        if not self.objects.has(cid, extension):
+            self.objects.put(cid, extension, self.codec.encode(data))
+        return cid
+    
+    def get_object(self, cid, extension):
+        """Bytes of an object stored by put_object, decompressed"""
+        if not CID_PATTERN.match(cid or ""):
+            raise Exception(f"Data with CID {cid} not found")
+        return self.codec.decode(self.objects.get(cid, extension))
+    
+    def compression_stats(self):
+        """Objects written and read per codec, bytes saved and time spent compressing and decompressing"""
+        return self.codec.get_stats()
     
     def store_data(self, data):
         """Store data and return simulated IPFS hash"""
         if isinstance(data, dict):
-            data_str = json.dumps(data, sort_keys=True)
+            payload = canonical.encode(data)
         else:
-            data_str = str(data)
+            payload = str(data).encode()
         
         # Generate hash as simulated CID
-        cid = hashlib.sha256(data_str.encode()).hexdigest()
+        cid = hashlib.sha256(payload).hexdigest()
         
-        # Store in file system (simulating IPFS)
-        file_path = os.path.join(self.storage_dir, f"{cid}.json")
-        with open(file_path, 'w') as f:
-            json.dump({'data': data_str}, f)
+        # Large payloads become a chunked DAG whose root CID identifies them
+        if len(payload) > self.chunk_size:
+            with self.open_writer() as writer:
+                writer.write(payload)
+            return writer.cid
         
-        return cid
+        # Content addressing: an existing object with this CID already holds this data,
+        # including one stored in the old JSON envelope
+        if self.find_object(cid, "json"):
+            return cid
+        
+        # Store in file system (simulating IPFS) as a binary object
+        return self.put_object(payload, OBJECT)
     
     def retrieve_data(self, cid):
         """Retrieve data using CID"""
-        file_path = os.path.join(self.storage_dir, f"{cid}.json")
+        if self.has_object(cid, OBJECT):
+            return self.get_object(cid, OBJECT).decode()
+        if not self.find_object(cid, "json") and self.has_object(cid, ROOT):
+            with DAGReader(self, cid) as reader:
+                return reader.read().decode()
+        # Objects stored before the binary format sit in a JSON envelope
+        with self._open_object(cid, "json", 'r') as f:
+            stored_data = json.load(f)
+        return stored_data['data']
+    
+    def _executor(self):
+        with self._io_lock:
+            if self._io_executor is None:
+                self._io_executor = ThreadPoolExecutor(self.io_concurrency, thread_name_prefix="ipfs-io")
+            return self._io_executor
+    
+    async def _run_io(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), function, *args)
+    
+    async def store_data_async(self, data):
+        """store_data on the I/O pool, without blocking the event loop"""
+        return await self._run_io(self.store_data, data)
+    
+    async def retrieve_data_async(self, cid):
+        """retrieve_data on the I/O pool, without blocking the event loop"""
+        return await self._run_io(self.retrieve_data, cid)
+    
+    async def retrieve_many(self, cids):
+        """Retrieve CIDs concurrently, at most io_concurrency at a time.
+        
+        Results are in input order; the entry of a CID that could not be
+        retrieved is its exception, so one bad CID does not fail the rest.
+        """
+        semaphore = asyncio.Semaphore(self.io_concurrency)
+        
+        async def retrieve(cid):
+            async with semaphore:
+                return await self.retrieve_data_async(cid)
+        
+        return await asyncio.gather(*(retrieve(cid) for cid in cids), return_exceptions=True)
+    
+    def open_writer(self):
+        """Start streaming a binary object into storage; close() returns its CID"""
+        return IPFSWriter(self)
+    
+    def open_reader(self, cid):
+        """Open a binary object stored through open_writer for reading; chunks load as they are read"""
+        if self.has_object(cid, ROOT):
+            return DAGReader(self, cid)
+        # Objects written before chunking are single files
+        return self._open_object(cid, "bin", 'rb')
+    
+    def read_range(self, cid, offset, length):
+        """Read length bytes at offset, loading and verifying only the chunks that cover them"""
+        with self.open_reader(cid) as reader:
+            reader.seek(offset)
+            return reader.read(length)
+    
+    def _writer_started(self):
+        with self._writers_condition:
+            while self._collecting:
+                self._writers_condition.wait()
+            self._writers += 1
+    
+    def _writer_finished(self):
+        with self._writers_condition:
+            self._writers -= 1
+            self._writers_condition.notify_all()
+    
+    def collect_garbage(self):
+        """Delete chunks that no stored root links to any more; returns how many were deleted"""
+        with self._writers_condition:
+            while self._writers or self._collecting:
+                self._writers_condition.wait()
+            self._collecting = True
         try:
-            with open(file_path, 'r') as f:
-                stored_data = json.load(f)
-            return stored_data['data']
-        except FileNotFoundError:
-            raise Exception(f"Data with CID {cid} not found")
+            referenced = set()
+            for cid in self.objects.list(ROOT):
+                with DAGReader(self, cid) as reader:
+                    referenced.update(link[0] for link in reader.links)
+            deleted = 0
+            for cid in self.objects.list(CHUNK):
+                if cid not in referenced and self.objects.delete(cid, CHUNK):
+                    deleted += 1
+            return deleted
+        finally:
+            with self._writers_condition:
+                self._collecting = False
+                self._writers_condition.notify_all()
     
     def delete_data(self, cid):
-        """Delete data (for cleanup)"""
-        file_path = os.path.join(self.storage_dir, f"{cid}.json")
-        try:
-            os.remove(file_path)
-            return True
-        except FileNotFoundError:
-            return False
\ No newline at end of file
+        """Delete data (for cleanup); chunks of a deleted DAG stay until collect_garbage"""
+        if not CID_PATTERN.match(cid or ""):
+            return False
+        deleted = False
+        for extension in (OBJECT, ROOT):
+            if self.objects.delete(cid, extension):
+                deleted = True
+        for extension in ("json", "bin"):
+            for file_path in (self.object_path(cid, extension), self._flat_path(cid, extension)):
+                try:
+                    os.remove(file_path)
+                    deleted = True
+                except FileNotFoundError:
+                    continue
+        return deleted
+    
+    def migrate_flat_layout(self, progress=None):
+        """Move objects from the flat layout into shards while the store stays in use.
+        
+        Each move is an atomic rename and readers check both layouts, so lookups
+        keep working throughout. Returns the number of objects migrated.
+        """
+        migrated = 0
+        with os.scandir(self.storage_dir) as entries:
+            for entry in entries:
+                match = FLAT_OBJECT.match(entry.name)
+                if not match or not entry.is_file():
+                    continue
+                cid, extension = match.groups()
+                target = self.object_path(cid, extension)
+                if os.path.exists(target):
+                    # Already stored under its shard; the flat copy is a duplicate
+                    os.remove(entry.path)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(entry.path, target)
+                migrated += 1
+                if progress:
+                    progress(migrated)
+        return migrated
+    
+    def migrate_in_background(self):
+        """Run migrate_flat_layout on a daemon thread and return the thread"""
+        thread = threading.Thread(target=self.migrate_flat_layout, name="ipfs-layout-migrator", daemon=True)
+        thread.start()
+        return thread
+    
+    def close(self):
+        """Stop the I/O pool, then flush and close the object store"""
+        with self._io_lock:
+            if self._io_executor is not None:
+                self._io_executor.shutdown()
+                self._io_executor = None
+        self.objects.close()
\ No newline at end of file
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from src.blockchain.blockchain_core import Block
+
+class LazyChain:
+    """List-like view of a BlockLog that loads block bodies on demand.
+
+    Only the log's offset index is held in memory; blocks are decoded from
+    the memory-mapped log when indexed, sliced or iterated, and a bounded
+    LRU keeps recently used ones. Appends are written through to the log.
+    """
+
+    def __init__(self, block_log, cache_size=1024):
+        self.block_log = block_log
+        self.cache_size = cache_size
+        # Blockchain that loaded blocks report their mutations to
+        self.owner = None
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.block_log)
+
+    def _load(self, position):
+        block = self._cache.get(position)
+        if block is not None:
+            self._cache.move_to_end(position)
+            return block
+
+        block = Block.from_dict(self.block_log.read_block_dict(position))
+        if self.owner is not None:
+            block.attach(self.owner)
+        self._cache[position] = block
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return block
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._load(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("chain index out of range")
+        return self._load(key)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self._load(position)
+
+    def append(self, block):
+        """Write the block to the log and keep it cached as the new tip"""
+        self.block_log.append_blocks([block])
+        position = len(self) - 1
+        self._cache[position] = block
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
@@ -0,0 +1,117 @@
+import hashlib
+import io
+import json
+from src.utils import canonical
+
+# Extensions of the two object kinds a DAG is made of
+CHUNK = "chunk"
+ROOT = "dag"
+
+def encode_root(chunk_size, links, size):
+    """Canonical root node bytes; links are [chunk cid, chunk length] pairs in order"""
+    return canonical.encode({"chunk_size": chunk_size, "links": links, "size": size})
+
+class DAGWriter:
+    """Splits a byte stream into fixed-size chunks stored once each, then writes the root linking them.
+
+    Every chunk but the last is exactly chunk_size bytes, so a byte offset maps
+    straight to its chunk without reading the others.
+    """
+
+    def __init__(self, ipfs, chunk_size):
+        self.ipfs = ipfs
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.links = []
+        self.size = 0
+        self.cid = None
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            take = min(self.chunk_size - len(self.buffer), len(view))
+            self.buffer += view[:take]
+            view = view[take:]
+            if len(self.buffer) == self.chunk_size:
+                self._flush_chunk()
+        return len(data)
+
+    def _flush_chunk(self):
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        self.links.append([self.ipfs.put_object(chunk, CHUNK), len(chunk)])
+        self.size += len(chunk)
+
+    def close(self):
+        """Write the last chunk and the root node; returns the root CID"""
+        if self.cid is not None:
+            return self.cid
+        if self.buffer:
+            self._flush_chunk()
+        self.cid = self.ipfs.put_object(encode_root(self.chunk_size, self.links, self.size), ROOT)
+        return self.cid
+
+class DAGReader(io.RawIOBase):
+    """Seekable file-like view of a DAG that loads and verifies one chunk at a time"""
+
+    def __init__(self, ipfs, cid):
+        super().__init__()
+        self.ipfs = ipfs
+        root_bytes = ipfs.get_object(cid, ROOT)
+        if hashlib.sha256(root_bytes).hexdigest() != cid:
+            raise Exception(f"Root node {cid} failed verification")
+        root = json.loads(root_bytes)
+        self.cid = cid
+        self.chunk_size = root["chunk_size"]
+        self.links = root["links"]
+        self.size = root["size"]
+        self.position = 0
+        self._chunk_index = None
+        self._chunk = b""
+
+    def _load_chunk(self, index):
+        if index != self._chunk_index:
+            chunk_cid, length = self.links[index]
+            chunk = self.ipfs.get_object(chunk_cid, CHUNK)
+            if len(chunk) != length or hashlib.sha256(chunk).hexdigest() != chunk_cid:
+                raise Exception(f"Chunk {chunk_cid} of {self.cid} failed verification")
+            self._chunk_index = index
+            self._chunk = chunk
+        return self._chunk
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self.position = offset
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        parts = []
+        remaining = min(size, max(self.size - self.position, 0))
+        while remaining > 0:
+            index, start = divmod(self.position, self.chunk_size)
+            part = self._load_chunk(index)[start:start + remaining]
+            parts.append(part)
+            self.position += len(part)
+            remaining -= len(part)
+        return b"".join(parts)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
@@ -0,0 +1,111 @@
+import lzma
+import math
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+
+class ObjectCodec:
+    """Binary on-disk object format with per-object compression.
+
+    An object is a 5-byte header (magic, codec id) followed by the payload,
+    stored raw or compressed. Small payloads and high-entropy ones (encrypted
+    or already compressed data) stay raw; larger ones use lzma, the rest zlib.
+    A compressed body is kept only when it is actually smaller.
+    """
+
+    MAGIC = b"EMRO"
+    HEADER = struct.Struct(">4sB")
+    RAW, ZLIB, LZMA = 0, 1, 2
+    NAMES = {RAW: "raw", ZLIB: "zlib", LZMA: "lzma"}
+    ENTROPY_SAMPLE = 4096
+
+    def __init__(self, min_size=512, lzma_min_size=1024 * 1024, max_entropy=7.5):
+        self.min_size = min_size
+        self.lzma_min_size = lzma_min_size
+        self.max_entropy = max_entropy
+        self.lock = threading.Lock()
+        self.stats = self._empty_stats()
+
+    @classmethod
+    def _empty_stats(cls):
+        return {
+            "objects_written": 0,
+            "objects_read": 0,
+            "by_codec": {name: 0 for name in cls.NAMES.values()},
+            "bytes_in": 0,
+            "bytes_stored": 0,
+            "compress_seconds": 0.0,
+            "decompress_seconds": 0.0
+        }
+
+    @staticmethod
+    def estimate_entropy(sample):
+        """Shannon entropy of a byte sample in bits per byte (0 to 8)"""
+        if not sample:
+            return 0.0
+        total = len(sample)
+        return -sum(count / total * math.log2(count / total) for count in Counter(sample).values())
+
+    def choose_codec(self, data):
+        """Codec for a payload, from its size and the entropy of its first bytes"""
+        if len(data) < self.min_size:
+            return self.RAW
+        if self.estimate_entropy(data[:self.ENTROPY_SAMPLE]) > self.max_entropy:
+            return self.RAW
+        return self.LZMA if len(data) >= self.lzma_min_size else self.ZLIB
+
+    def encode(self, data):
+        """Stored bytes for a payload"""
+        start = time.perf_counter()
+        codec = self.choose_codec(data)
+        body = data
+        if codec == self.ZLIB:
+            body = zlib.compress(data, 6)
+        elif codec == self.LZMA:
+            body = lzma.compress(data, preset=6)
+        if len(body) >= len(data):
+            codec, body = self.RAW, data
+        elapsed = time.perf_counter() - start
+
+        stored = self.HEADER.pack(self.MAGIC, codec) + body
+        with self.lock:
+            self.stats["objects_written"] += 1
+            self.stats["by_codec"][self.NAMES[codec]] += 1
+            self.stats["bytes_in"] += len(data)
+            self.stats["bytes_stored"] += len(stored)
+            self.stats["compress_seconds"] += elapsed
+        return stored
+
+    def decode(self, stored):
+        """Payload of stored bytes written by encode"""
+        start = time.perf_counter()
+        magic, codec = self.HEADER.unpack_from(stored)
+        if magic != self.MAGIC:
+            raise Exception("Not a stored EMR object")
+        body = memoryview(stored)[self.HEADER.size:]
+        if codec == self.RAW:
+            data = bytes(body)
+        elif codec == self.ZLIB:
+            data = zlib.decompress(body)
+        elif codec == self.LZMA:
+            data = lzma.decompress(body)
+        else:
+            raise Exception(f"Unknown object codec {codec}")
+        with self.lock:
+            self.stats["objects_read"] += 1
+            self.stats["decompress_seconds"] += time.perf_counter() - start
+        return data
+
+    def get_stats(self):
+        """Snapshot of the counters, with bytes saved and the overall ratio"""
+        with self.lock:
+            stats = dict(self.stats, by_codec=dict(self.stats["by_codec"]))
+        stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_stored"]
+        stats["ratio"] = stats["bytes_stored"] / stats["bytes_in"] if stats["bytes_in"] else 1.0
+        return stats
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = self._empty_stats()
@@ -0,0 +1,320 @@
+import mmap
+import os
+import re
+import struct
+import threading
+
+PACK_FILE = re.compile(r"^pack-(\d{6})\.pack$")
+
+class PackStore:
+    """Small IPFS objects appended to rolling packfiles and found through a sorted CID index.
+
+    A pack is a sequence of records: a header (raw 32-byte CID, extension code,
+    length) and the stored bytes. Deleting appends a tombstone naming the pack
+    and offset of the record it cancels. Reads go through mmap.
+
+    The index file holds each pack's committed size and the live entries sorted
+    by CID. On open, only pack bytes past the committed sizes are replayed, and
+    a torn record at the end of a pack is cut off. Sealed packs that are mostly
+    dead are compacted on a background thread: their live objects, and the
+    tombstones whose cancelled record sits in a pack that still exists, are
+    copied into the active pack, the index is saved and the old file removed.
+    Replaying every pack therefore never brings back a deleted object.
+    """
+
+    INDEX_MAGIC = b"EMRPIDX1"
+    INDEX_HEADER = struct.Struct(">8sI")
+    PACK_SIZE = struct.Struct(">IQ")
+    ENTRY_COUNT = struct.Struct(">Q")
+    ENTRY = struct.Struct(">32sBIQI")
+    RECORD = struct.Struct(">32sBI")
+    TOMBSTONE = 0xFFFFFFFF
+    # Body of a tombstone: pack and data offset of the cancelled record
+    TARGET = struct.Struct(">IQ")
+    EXTENSIONS = ("obj", "chunk", "dag")
+
+    def __init__(self, directory, max_pack_size=64 * 1024 * 1024, compact_ratio=0.5):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "packs.idx")
+        self.max_pack_size = max_pack_size
+        self.compact_ratio = compact_ratio
+        self.lock = threading.RLock()
+        # (raw cid, extension code) -> (pack id, data offset, length)
+        self._index = {}
+        self._pack_sizes = {}
+        self._maps = {}
+        self._active = None
+        self._file = None
+        self._compactor = None
+        self._compact_requested = threading.Event()
+        self._closed = False
+        self.open()
+
+    def _pack_path(self, pack):
+        return os.path.join(self.directory, f"pack-{pack:06d}.pack")
+
+    def _key(self, cid, extension):
+        if extension not in self.EXTENSIONS:
+            raise Exception(f"Unsupported object type for packfiles: {extension}")
+        return bytes.fromhex(cid), self.EXTENSIONS.index(extension)
+
+    # Loading
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        packs = sorted(int(match.group(1)) for match in map(PACK_FILE.match, os.listdir(self.directory)) if match)
+        committed = self._load_index(packs)
+        if committed:
+            # Packs the index no longer lists, other than newer ones, were compacted
+            # away; the crash came between saving the index and removing the file
+            for pack in [pack for pack in packs if pack not in committed and pack < max(committed)]:
+                os.remove(self._pack_path(pack))
+                packs.remove(pack)
+        for pack in packs:
+            self._pack_sizes[pack] = self._replay(pack, committed.get(pack, 0))
+        self._active = packs[-1] if packs else 1
+        self._pack_sizes.setdefault(self._active, 0)
+        self._file = open(self._pack_path(self._active), 'ab')
+
+    def _load_index(self, packs):
+        """Load the saved index; returns the committed size of each pack it covers"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            magic, pack_count = self.INDEX_HEADER.unpack_from(data)
+            if magic != self.INDEX_MAGIC:
+                return {}
+            position = self.INDEX_HEADER.size
+            committed = {}
+            for _ in range(pack_count):
+                pack, size = self.PACK_SIZE.unpack_from(data, position)
+                position += self.PACK_SIZE.size
+                committed[pack] = size
+            (entry_count,) = self.ENTRY_COUNT.unpack_from(data, position)
+            position += self.ENTRY_COUNT.size
+            index = {}
+            for _ in range(entry_count):
+                cid, code, pack, offset, length = self.ENTRY.unpack_from(data, position)
+                position += self.ENTRY.size
+                index[(cid, code)] = (pack, offset, length)
+        except (OSError, struct.error):
+            return {}
+        # An index that points past the packs on disk is stale; rebuild from the packs instead
+        for pack, size in committed.items():
+            if pack not in packs or os.path.getsize(self._pack_path(pack)) < size:
+                return {}
+        self._index = index
+        return committed
+
+    def _replay(self, pack, start):
+        """Apply records from start to the end of a pack; returns its valid size"""
+        path = self._pack_path(pack)
+        with open(path, 'rb') as f:
+            data = f.read()
+        position = start
+        while position + self.RECORD.size <= len(data):
+            cid, code, length = self.RECORD.unpack_from(data, position)
+            body = position + self.RECORD.size
+            if length == self.TOMBSTONE:
+                if body + self.TARGET.size > len(data):
+                    break
+                target = self.TARGET.unpack_from(data, body)
+                # A tombstone only cancels the record it names, never a later put of the same CID
+                if self._index.get((cid, code), (None, None))[:2] == target:
+                    del self._index[(cid, code)]
+                position = body + self.TARGET.size
+                continue
+            if body + length > len(data):
+                break
+            self._index[(cid, code)] = (pack, body, length)
+            position = body + length
+        if position != len(data):
+            # A record torn by a crash is dropped
+            with open(path, 'r+b') as f:
+                f.truncate(position)
+        return position
+
+    def save_index(self):
+        """Write the sorted index and the committed pack sizes"""
+        with self.lock:
+            parts = [self.INDEX_HEADER.pack(self.INDEX_MAGIC, len(self._pack_sizes))]
+            parts += [self.PACK_SIZE.pack(pack, size) for pack, size in sorted(self._pack_sizes.items())]
+            parts.append(self.ENTRY_COUNT.pack(len(self._index)))
+            parts += [self.ENTRY.pack(cid, code, *location) for (cid, code), location in sorted(self._index.items())]
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(b"".join(parts))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.index_path)
+
+    # Objects
+
+    def has(self, cid, extension):
+        with self.lock:
+            return self._key(cid, extension) in self._index
+
+    def _append(self, cid, code, data, length):
+        if self._pack_sizes[self._active] >= self.max_pack_size:
+            self._roll()
+        position = self._pack_sizes[self._active]
+        self._file.write(self.RECORD.pack(cid, code, length) + data)
+        self._file.flush()
+        self._pack_sizes[self._active] += self.RECORD.size + len(data)
+        return self._active, position + self.RECORD.size
+
+    def _sync_active(self):
+        """Make the active pack durable; an index saved after this never outlives its bytes"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _roll(self):
+        # Packs sealed while compacting hold copied objects, so they reach disk before the index does
+        self._sync_active()
+        self._file.close()
+        self._active += 1
+        self._pack_sizes[self._active] = 0
+        self._file = open(self._pack_path(self._active), 'ab')
+        # The sealed pack may already be worth compacting
+        self._compact_requested.set()
+
+    def put(self, cid, extension, stored):
+        key = self._key(cid, extension)
+        with self.lock:
+            if key in self._index:
+                return
+            pack, offset = self._append(key[0], key[1], stored, len(stored))
+            self._index[key] = (pack, offset, len(stored))
+
+    def _map(self, pack, end):
+        """Memory map of a pack covering at least its first end bytes"""
+        view = self._maps.get(pack)
+        if view is None or len(view) < end:
+            # Map the pack again once it has grown past the current mapping
+            if view is not None:
+                view.close()
+            with open(self._pack_path(pack), 'rb') as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack] = view
+        return view
+
+    def _read(self, pack, offset, length):
+        return self._map(pack, offset + length)[offset:offset + length]
+
+    def get(self, cid, extension):
+        with self.lock:
+            location = self._index.get(self._key(cid, extension))
+            if location is None:
+                raise Exception(f"Data with CID {cid} not found")
+            return self._read(*location)
+
+    def delete(self, cid, extension):
+        key = self._key(cid, extension)
+        with self.lock:
+            location = self._index.pop(key, None)
+            if location is None:
+                return False
+            self._append(key[0], key[1], self.TARGET.pack(*location[:2]), self.TOMBSTONE)
+        self._compact_requested.set()
+        return True
+
+    def list(self, extension):
+        """CIDs of every stored object of one type"""
+        code = self.EXTENSIONS.index(extension)
+        with self.lock:
+            return [cid.hex() for cid, key_code in self._index if key_code == code]
+
+    # Compaction
+
+    def live_bytes(self, pack):
+        with self.lock:
+            return sum(self.RECORD.size + length for pack_id, _, length in self._index.values() if pack_id == pack)
+
+    def compaction_candidates(self):
+        """Sealed packs whose dead bytes exceed compact_ratio of their size"""
+        with self.lock:
+            live = {}
+            for pack, _, length in self._index.values():
+                live[pack] = live.get(pack, 0) + self.RECORD.size + length
+            return [pack for pack, size in self._pack_sizes.items()
+                    if pack != self._active and size - live.get(pack, 0) > self.compact_ratio * size]
+
+    def compact_pack(self, pack):
+        """Copy a sealed pack's live objects into the active pack and remove it"""
+        with self.lock:
+            keys = [key for key, location in self._index.items() if location[0] == pack]
+        for key in keys:
+            # One object per lock hold, so reads and writes interleave with compaction
+            with self.lock:
+                location = self._index.get(key)
+                if location is None or location[0] != pack:
+                    continue
+                data = self._read(*location)
+                new_pack, offset = self._append(key[0], key[1], data, len(data))
+                self._index[key] = (new_pack, offset, len(data))
+        with self.lock:
+            if any(location[0] == pack for location in self._index.values()):
+                return False
+            self._carry_tombstones(pack)
+            del self._pack_sizes[pack]
+            view = self._maps.pop(pack, None)
+            if view is not None:
+                view.close()
+            # The copies must be on disk before the index points at them and the source goes
+            self._sync_active()
+            # Saved first: open() removes a pack the index has dropped, so a crash cannot replay it
+            self.save_index()
+            os.remove(self._pack_path(pack))
+            return True
+
+    def _carry_tombstones(self, pack):
+        """Copy a pack's tombstones forward while the records they cancel are still on disk"""
+        size = self._pack_sizes[pack]
+        view = self._map(pack, size)
+        position = 0
+        while position < size:
+            cid, code, length = self.RECORD.unpack_from(view, position)
+            body = position + self.RECORD.size
+            if length != self.TOMBSTONE:
+                position = body + length
+                continue
+            target = view[body:body + self.TARGET.size]
+            target_pack, _ = self.TARGET.unpack(target)
+            if target_pack != pack and target_pack in self._pack_sizes:
+                self._append(cid, code, target, self.TOMBSTONE)
+            position = body + self.TARGET.size
+
+    def compact(self):
+        """Compact every candidate pack now; returns how many were removed"""
+        return sum(1 for pack in self.compaction_candidates() if self.compact_pack(pack))
+
+    def _run_compactor(self):
+        while True:
+            self._compact_requested.wait()
+            self._compact_requested.clear()
+            if self._closed:
+                return
+            self.compact()
+
+    def start_compactor(self):
+        """Compact mostly-dead packs in the background after deletes and pack rolls"""
+        with self.lock:
+            if self._compactor is None and not self._closed:
+                self._compactor = threading.Thread(target=self._run_compactor, name="ipfs-pack-compactor", daemon=True)
+                self._compactor.start()
+
+    def close(self):
+        with self.lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._compact_requested.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self.lock:
+            self._sync_active()
+            self.save_index()
+            self._file.close()
+            for view in self._maps.values():
+                view.close()
+            self._maps.clear()
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+class DecryptedRecordCache:
+    """LRU of decrypted EMR plaintext keyed by (doctor_id, ipfs_hash), bounded by bytes and age.
+
+    Entries are also indexed by (patient_id, doctor_id) so revoking a doctor's
+    access can drop everything that doctor decrypted for the patient at once.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300.0, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # (doctor_id, ipfs_hash) -> (plaintext, size, expires at, patient_id)
+        self._entries = OrderedDict()
+        # (patient_id, doctor_id) -> set of (doctor_id, ipfs_hash)
+        self._by_grant = {}
+        self._bytes = 0
+
+    def _remove(self, key):
+        plaintext, size, expires, patient_id = self._entries.pop(key)
+        self._bytes -= size
+        grant = (patient_id, key[0])
+        keys = self._by_grant.get(grant)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_grant[grant]
+
+    def get(self, doctor_id, ipfs_hash):
+        """Cached plaintext, or None when missing or expired"""
+        key = (doctor_id, ipfs_hash)
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= self.clock():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, doctor_id, patient_id, ipfs_hash, plaintext):
+        """Cache a decrypted record string, evicting least recently used entries past the budget"""
+        size = len(plaintext.encode()) if isinstance(plaintext, str) else len(plaintext)
+        if size > self.max_bytes:
+            return
+        key = (doctor_id, ipfs_hash)
+        with self.lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (plaintext, size, self.clock() + self.ttl, patient_id)
+            self._by_grant.setdefault((patient_id, doctor_id), set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def purge(self, patient_id, doctor_id):
+        """Drop every record the doctor decrypted for the patient; returns how many were dropped"""
+        with self.lock:
+            keys = list(self._by_grant.get((patient_id, doctor_id), ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self._by_grant.clear()
+            self._bytes = 0
+
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
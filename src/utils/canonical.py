@@ -0,0 +1,41 @@
+import hashlib
+import json
+
+# The one encoding behind every hash and signature in the system: json.dumps with
+# sorted keys and default separators. Chains and signatures already on disk depend
+# on it byte for byte, so it must not change.
+
+def encode(value):
+    """Canonical bytes of a JSON value"""
+    return json.dumps(value, sort_keys=True).encode()
+
+def encode_payload(data):
+    """Bytes that are signed or stored for data: strings as-is, anything else canonically encoded"""
+    if isinstance(data, str):
+        return data.encode()
+    return encode(data)
+
+def digest(data):
+    """SHA-256 of a payload's canonical bytes, as raw bytes"""
+    return hashlib.sha256(encode_payload(data)).digest()
+
+def hexdigest(data):
+    """SHA-256 of a payload's canonical bytes, as hex"""
+    return hashlib.sha256(encode_payload(data)).hexdigest()
+
+def split_around(fields, key):
+    """Split the encoding of fields plus an integer under key into the bytes before and after that integer.
+
+    Joining the two parts around b"%d" % value gives exactly encode({**fields, key: value}).
+    """
+    before = []
+    after = []
+    for name in sorted(fields):
+        item = f"{json.dumps(name)}: {json.dumps(fields[name], sort_keys=True)}"
+        if name < key:
+            before.append(item)
+        else:
+            after.append(item)
+    prefix = "{" + "".join(item + ", " for item in before) + f"{json.dumps(key)}: "
+    suffix = "".join(", " + item for item in after) + "}"
+    return prefix.encode(), suffix.encode()
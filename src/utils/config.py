@@ -8,13 +8,77 @@ class Config:
     PATIENTS_FILE = os.path.join(DATA_DIR, "patients.json")
     DOCTORS_FILE = os.path.join(DATA_DIR, "doctors.json")
     BLOCKCHAIN_FILE = os.path.join(DATA_DIR, "blockchain_data.json")
+    BLOCKCHAIN_LOG_FILE = os.path.join(DATA_DIR, "blockchain.log")
+    BLOCKCHAIN_INDEX_FILE = os.path.join(DATA_DIR, "blockchain.idx")
+    # Digests of signatures already verified successfully
+    VERIFICATION_CACHE_FILE = os.path.join(DATA_DIR, "verified_signatures.bin")
     
     # ECC Configuration
     ECC_CURVE = "secp256r1"
+    # Signing backend: "cryptography" (OpenSSL) or "ecdsa" (pure Python); both read and write the same keys and signatures
+    CRYPTO_BACKEND = "cryptography"
+    KEY_CACHE_SIZE = 1024  # parsed key objects kept per process
+    KEY_PRECOMPUTE_THRESHOLD = 16  # uses before a verifying key gets precomputed tables
+    KEY_PRECOMPUTE_MAX = 64  # precomputed verifying keys kept at once
+    # Pre-generated key pairs for registrations: refill to the high watermark once below the low one
+    KEY_POOL_LOW_WATERMARK = 16
+    KEY_POOL_HIGH_WATERMARK = 64  # 0 disables the background pool
+    # Bulk registration: records saved per batch, and processes generating their keys
+    BULK_REGISTRATION_BATCH_SIZE = 5000
+    KEYGEN_WORKERS = os.cpu_count() or 1
+    
+    # Streamed attachment encryption: plaintext bytes per AES-GCM chunk
+    STREAM_CHUNK_SIZE = 64 * 1024
+    
+    # Batch signature verification
+    SIGNATURE_VERIFY_WORKERS = os.cpu_count() or 1
+    PARALLEL_VERIFY_MIN_BATCH = 32
     
     # Blockchain Configuration
     DIFFICULTY = 4
     MINING_REWARD = 10
     
+    # Blockchain storage: "log" (append-only block log) or "json" (single rewritten file)
+    BLOCKCHAIN_STORAGE = "log"
+    BLOCK_LOG_COMPACT_INTERVAL = 1000  # appends between dead-space checks
+    BLOCK_LOG_COMPACT_RATIO = 0.25  # compact once dead bytes exceed this share of live bytes
+    # Serve blocks from the log on demand instead of loading the whole chain at startup
+    LAZY_BLOCK_LOADING = True
+    BLOCK_CACHE_SIZE = 1024  # decoded blocks kept in memory
+    
+    # Parallel mining: worker processes, and the difficulty below which mining stays in-process
+    MINING_WORKERS = os.cpu_count() or 1
+    PARALLEL_MINING_MIN_DIFFICULTY = 5
+    
+    # Parallel validation for full-chain audits
+    VALIDATION_WORKERS = os.cpu_count() or 1
+    PARALLEL_VALIDATION_MIN_BLOCKS = 5000
+    
+    # Mempool: a block is sealed at whichever limit is reached first
+    MEMPOOL_MAX_TRANSACTIONS = 500
+    MEMPOOL_MAX_BYTES = 1024 * 1024
+    MEMPOOL_MAX_WAIT = 2.0  # seconds
+    
+    # Decrypted record cache for repeat views; entries are purged when access is revoked
+    RECORD_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    RECORD_CACHE_TTL = 300  # seconds
+    
     # IPFS Simulation
-    IPFS_STORAGE = os.path.join(DATA_DIR, "ipfs_storage")
\ No newline at end of file
+    IPFS_STORAGE = os.path.join(DATA_DIR, "ipfs_storage")
+    # Objects are sharded as ab/cd/<cid>; flat-layout objects are migrated in the background at startup
+    IPFS_SHARD_DEPTH = 2
+    IPFS_SHARD_WIDTH = 2
+    # Binary objects and records larger than this are stored as chunks linked by a root node
+    IPFS_CHUNK_SIZE = 256 * 1024
+    # Stored objects are compressed from this size unless their sampled entropy
+    # (bits per byte) says they are already dense; lzma from the larger size, zlib below it
+    IPFS_COMPRESS_MIN_SIZE = 512
+    IPFS_COMPRESS_MAX_ENTROPY = 7.5
+    IPFS_LZMA_MIN_SIZE = 1024 * 1024
+    # Object store: "files" keeps one file per object, "pack" appends them to rolling packfiles
+    # under <storage>/packs; packs whose dead bytes pass the ratio are compacted in the background
+    IPFS_BACKEND = "files"
+    IPFS_PACK_MAX_SIZE = 64 * 1024 * 1024
+    IPFS_PACK_COMPACT_RATIO = 0.5
+    # Concurrent file reads and writes for the async store/retrieve path
+    IPFS_IO_CONCURRENCY = 16
\ No newline at end of file